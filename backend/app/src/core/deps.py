@@ -2,7 +2,7 @@ from fastapi import Depends, Request, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from typing import Annotated
 from helpers.jwt import validate_access_token, AvailableTokenTypes
-from redis_service import RedisConn
+from redis_service import RedisConn, is_redis_set_member, TRACKED_PLAYER_TAGS_KEY
 from clash_royale_api import ClashRoyaleAPI
 from mongo import MongoConn, check_player_tracked
 
@@ -39,14 +39,20 @@ RedConn = Annotated[RedisConn, Depends(get_redis)]
 
 
 # Dependency that ensures the given player tag is active in the players collection
-async def require_tracked_player(player_tag: str, cr_api: CrApi, mongo_conn: DbConn):
+async def require_tracked_player(
+    player_tag: str, cr_api: CrApi, mongo_conn: DbConn, redis_conn: RedConn
+):
     """
     FastAPI dependency that ensures a given player tag is valid and currently tracked.
 
+    The tracked/active check uses the tracked player tags cached by the data scraper,
+    only if they aren't cached (or Redis fails) the players collection is queried.
+
     Args:
         player_tag (str): Player tag from the path.
         cr_api (CrApi): Injected Clash Royale API client (for syntax validation).
         mongo_conn (DbConn): Injected Mongo connection (for tracked/active check).
+        redis_conn (RedConn): Injected Redis connection (for the cached tracked player tags).
 
     Returns:
         str: The player tag when validation succeeds.
@@ -61,8 +67,17 @@ async def require_tracked_player(player_tag: str, cr_api: CrApi, mongo_conn: DbC
             status_code=403, detail=f"Player with tag {player_tag} doesn't exist"
         )
 
-    # Check if the player is in players collection and active
-    if not await check_player_tracked(mongo_conn, player_tag):
+    # Check if the player is in the cached tracked tags, else in players collection and active
+    try:
+        is_tracked = await is_redis_set_member(
+            redis_conn, TRACKED_PLAYER_TAGS_KEY, player_tag
+        )
+    except Exception:
+        is_tracked = None
+    if is_tracked is None:
+        is_tracked = await check_player_tracked(mongo_conn, player_tag)
+
+    if not is_tracked:
         raise HTTPException(
             status_code=403, detail=f"Player with tag {player_tag} isn't being tracked"
         )
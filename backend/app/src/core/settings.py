@@ -49,6 +49,9 @@ class Settings:
     # Amount of guesses a user has to solve a wordle
     MAX_WORDLE_GUESSES: int = 6
 
+    # Logging Configuration
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+
     # Application Configuration
     INIT_RETRIES: int = 3
     INIT_RETRY_DELAY: float = 3
@@ -79,6 +82,12 @@ class Settings:
     )  # 1 minute (short cache time, query params likely to change often with before timestamp. Also no real calculation effort needed for retrieving last battles)
     CACHE_TTL_DECK_STATS: int = 10 * 60  # 10 minutes
     CACHE_TTL_CARD_STATS: int = 10 * 60  # 10 minutes
+    # Deck/card/daily stats of date ranges that ended before yesterday can't get new battles,
+    # they are cached outside of the versioning and therefore not invalidated with every cycle
+    CACHE_TTL_CLOSED_RANGE_STATS: int = 24 * 60 * 60  # 24 hours
+    # Parsed closed range stats are also kept in each API process, saving the Redis round trip
+    # and parsing for the closed part of rolling windows
+    CACHE_TTL_LOCAL_CLOSED_RANGE_STATS: int = 30 * 60  # 30 minutes
 
     # Get set both in current and ahead version of the cache, and therefore not invalidated with every cycle
     CACHE_TTL_CAPTCHA_CHALLENGE: int = (
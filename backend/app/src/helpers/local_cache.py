@@ -0,0 +1,55 @@
+import time
+from collections import OrderedDict
+from typing import Any
+
+# Upper bound of entries kept in-process, the least recently used one is dropped first
+LOCAL_CACHE_MAX_ENTRIES = 1024
+
+# Values and their monotonic expiry timestamp, by key, in least recently used order
+_entries: OrderedDict[str, tuple[Any, float]] = OrderedDict()
+
+
+def local_cache_get(key: str) -> Any:
+    """
+    Gets a value from the in-process cache.
+
+    Cached values are shared between requests and must not be mutated.
+
+    Args:
+        key (str): The key the value was cached under.
+
+    Returns:
+        Any: The cached value, None if it is missing or expired.
+    """
+
+    entry = _entries.get(key)
+    if entry is None:
+        return None
+
+    value, expires_at = entry
+    if time.monotonic() >= expires_at:
+        del _entries[key]
+        return None
+
+    _entries.move_to_end(key)
+    return value
+
+
+def local_cache_set(key: str, value: Any, ttl: float):
+    """
+    Puts a value into the in-process cache.
+
+    Only meant for values that can't change anymore (e.g. statistics of closed date
+    ranges), entries aren't invalidated with the scraping cycles.
+
+    Args:
+        key (str): The key to cache the value under.
+        value (Any): The value to cache.
+        ttl (float): Seconds the value is kept.
+    """
+
+    _entries[key] = (value, time.monotonic() + ttl)
+    _entries.move_to_end(key)
+
+    while len(_entries) > LOCAL_CACHE_MAX_ENTRIES:
+        _entries.popitem(last=False)
@@ -0,0 +1,47 @@
+import asyncio
+from typing import Any, Awaitable, Callable
+
+# Futures of the computations currently running, by their key
+_inflight: dict[str, asyncio.Future] = {}
+
+
+async def single_flight(key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+    """
+    Runs `func` once for all concurrent callers with the same key.
+
+    The first caller runs the computation, callers arriving while it is still
+    running await its result (or exception) instead of starting their own.
+    Once finished, the next caller with the key runs it again.
+
+    Args:
+        key (str): Identifies the computation, e.g. the Redis key its result is cached under.
+        func (Callable[[], Awaitable[Any]]): Coroutine function performing the computation.
+
+    Returns:
+        Any: The result of the computation.
+
+    Raises:
+        Exception: Whatever the computation raised, for every waiting caller.
+    """
+
+    fut = _inflight.get(key)
+    if fut is not None:
+        # Shield, so a disconnecting waiter doesn't cancel the result for everyone else
+        return await asyncio.shield(fut)
+
+    fut = asyncio.get_running_loop().create_future()
+    _inflight[key] = fut
+    try:
+        result = await func()
+    except BaseException as e:
+        if isinstance(e, asyncio.CancelledError):
+            fut.cancel()
+        else:
+            fut.set_exception(e)
+            fut.exception()  # Mark as retrieved, there might be no waiters
+        raise
+    else:
+        fut.set_result(result)
+        return result
+    finally:
+        del _inflight[key]
@@ -0,0 +1,157 @@
+from datetime import datetime
+
+from mongo import STATS_RESULT_LIMIT
+
+
+def _as_iso(value):
+    """
+    Returns datetimes as ISO strings, cached results already store them that way.
+
+    Args:
+        value: A datetime or an ISO formatted string
+
+    Returns:
+        str: The ISO formatted datetime
+    """
+
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _win_rate(wins: int, total: int) -> float:
+    """Win rate in percent, same calculation as the aggregation pipelines."""
+    return 0 if total == 0 else wins / total * 100
+
+
+def merge_deck_stats(*deck_lists: list) -> list:
+    """
+    Merges deck statistics of disjoint date ranges into the statistics of their union.
+
+    Counts and wins are summed, first/last seen widened and game modes united per deck.
+    The win rate is recalculated, the decks sorted by count (descending) and lastSeen
+    and capped to `STATS_RESULT_LIMIT`, the same as the stats aggregation does.
+
+    Args:
+        *deck_lists (list): The `decks` lists of the date ranges
+
+    Returns:
+        list: The merged decks, sorted by count (descending) and lastSeen,
+              at most `STATS_RESULT_LIMIT`
+    """
+
+    merged = {}
+    for decks in deck_lists:
+        for deck in decks:
+            # The deck cards are sorted and level-free, so they identify the deck
+            key = tuple(
+                (card.get("id"), card.get("evolutionLevel")) for card in deck["deck"]
+            )
+            first_seen = _as_iso(deck["firstSeen"])
+            last_seen = _as_iso(deck["lastSeen"])
+
+            entry = merged.get(key)
+            if entry is None:
+                merged[key] = {
+                    **deck,
+                    "firstSeen": first_seen,
+                    "lastSeen": last_seen,
+                    "modes": list(deck["modes"]),
+                }
+                continue
+
+            entry["count"] += deck["count"]
+            entry["wins"] += deck["wins"]
+            entry["firstSeen"] = min(entry["firstSeen"], first_seen)
+            entry["lastSeen"] = max(entry["lastSeen"], last_seen)
+            entry["modes"] += [m for m in deck["modes"] if m not in entry["modes"]]
+
+    result = list(merged.values())
+    for deck in result:
+        deck["winRate"] = _win_rate(deck["wins"], deck["count"])
+
+    # Sort by count (descending), ties by lastSeen (descending)
+    result.sort(key=lambda deck: (deck["count"], deck["lastSeen"]), reverse=True)
+    return result[:STATS_RESULT_LIMIT]
+
+
+def merge_card_stats(*card_lists: list) -> list:
+    """
+    Merges card statistics of disjoint date ranges into the statistics of their union.
+
+    Usages and wins are summed per card (id and evolution level), the win rate is
+    recalculated, the cards sorted by usage (descending) and capped to `STATS_RESULT_LIMIT`,
+    the same as the stats aggregation does.
+
+    Args:
+        *card_lists (list): The `cards` lists of the date ranges
+
+    Returns:
+        list: The merged cards, sorted by usage (descending), at most `STATS_RESULT_LIMIT`
+    """
+
+    merged = {}
+    for cards in card_lists:
+        for card in cards:
+            key = (card["card"].get("id"), card["card"].get("evolutionLevel"))
+
+            entry = merged.get(key)
+            if entry is None:
+                merged[key] = dict(card)
+                continue
+
+            entry["usage"] += card["usage"]
+            entry["wins"] += card["wins"]
+
+    result = list(merged.values())
+    for card in result:
+        card["winRate"] = _win_rate(card["wins"], card["usage"])
+
+    result.sort(key=lambda card: card["usage"], reverse=True)
+    return result[:STATS_RESULT_LIMIT]
+
+
+def merge_deck_and_card_stats(*stats: dict) -> dict:
+    """
+    Merges results of `get_decks_and_cards_win_percentage` for disjoint date ranges.
+
+    The total battles are summed from the totals of the ranges, which count every
+    battle, not just the ones of the capped decks.
+
+    Args:
+        *stats (dict): Results with the `decks` and `cards` statistics of each date range
+
+    Returns:
+        dict: Containing the merged `decks` and `cards` statistics, in the same shape
+    """
+
+    total_battles = sum(s["decks"]["totalBattles"] for s in stats)
+    return {
+        "decks": {
+            "decks": merge_deck_stats(*(s["decks"]["decks"] for s in stats)),
+            "totalBattles": total_battles,
+        },
+        "cards": {
+            "cards": merge_card_stats(*(s["cards"]["cards"] for s in stats)),
+            "totalBattles": total_battles,
+        },
+    }
+
+
+def merge_daily_stats(*stats: dict) -> dict:
+    """
+    Merges results of `get_daily_stats` for disjoint date ranges.
+
+    The ranges share no day, so the daily entries are combined as they are.
+
+    Args:
+        *stats (dict): Results with the `daily` entries and `totalBattles` of each date range
+
+    Returns:
+        dict: Containing all `daily` entries sorted by date and the summed `totalBattles`
+    """
+
+    daily = [day for s in stats for day in s["daily"]]
+    daily.sort(key=lambda day: day["date"])
+    return {
+        "daily": daily,
+        "totalBattles": sum(s["totalBattles"] for s in stats),
+    }
@@ -1,6 +1,7 @@
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 import asyncio
+import logging
 from contextlib import asynccontextmanager
 from fastapi_limiter import FastAPILimiter
 from redis.asyncio import Redis
@@ -14,11 +15,14 @@ from routers import (
     auth,
 )
 from core.settings import settings
+from log_config import setup_logging
 from redis_service import RedisConn
 from clash_royale_api import ClashRoyaleAPI
-from mongo import MongoConn
+from mongo import MongoConn, ensure_battle_indexes, ensure_player_indexes
 from helpers.ip_utils import rate_limit_key_func, get_real_client_ip
 
+logger = logging.getLogger(__name__)
+
 # NOTE time response from Clash Royale/MongoDB is in UTC so frontend needs conversion logic
 # both for the query parameter time but also the times the user gets back, which needs to be displayed in their local time
 # TODO add ip-based request limitations for routes
@@ -59,14 +63,14 @@ async def retry_async(func, name):
         try:
             return await func()
         except Exception as e:
-            print(
-                f"[ERROR] Failed to connect to {name} (attempt {attempt}/{retries}): {e}"
+            logger.error(
+                "Failed to connect to %s (attempt %d/%d): %s", name, attempt, retries, e
             )
             if attempt < retries:
                 await asyncio.sleep(delay)
             else:
-                print(
-                    f"[ERROR] Exiting after {retries} failed attempts to connect to {name}"
+                logger.error(
+                    "Exiting after %d failed attempts to connect to %s", retries, name
                 )
                 exit(1)
 
@@ -74,6 +78,9 @@ async def retry_async(func, name):
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
+    # Log records of the shared packages (e.g. mongo) are written by a background thread
+    log_listener = setup_logging(settings.LOG_LEVEL)
+
     # Retry Clash Royale API
     cr_api = ClashRoyaleAPI(api_key=settings.API_TOKEN)
     await retry_async(cr_api.check_connection, name="Clash Royale API")
@@ -93,6 +100,21 @@ async def lifespan(app: FastAPI):
     await retry_async(mongo_conn.connect, name="MongoDB")
     app.state.mongo = mongo_conn
 
+    # The battle reads of the stats routes hint the player/battleTime indexes,
+    # they fail without them, so the API doesn't start
+    try:
+        await ensure_battle_indexes(mongo_conn)
+    except Exception as e:
+        logger.error("Exiting after failing to create the battle indexes: %s", e)
+        exit(1)
+
+    # The tracked player checks hint the partial active players index as well
+    try:
+        await ensure_player_indexes(mongo_conn)
+    except Exception as e:
+        logger.error("Exiting after failing to create the player indexes: %s", e)
+        exit(1)
+
     # Init rate limiting
     rate_limit_redis = Redis(host="redis-rate-limit", port=6379, db=0)
     await FastAPILimiter.init(rate_limit_redis, identifier=rate_limit_key_func)
@@ -103,6 +125,7 @@ async def lifespan(app: FastAPI):
     await app.state.cr_api.close()
     mongo_conn.close()
     await redis_conn.close()
+    log_listener.stop()  # flush queued records
 
 
 app = FastAPI(lifespan=lifespan)
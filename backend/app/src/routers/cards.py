@@ -3,6 +3,7 @@ import httpx
 
 from core.deps import CrApi, RedConn
 from core.settings import settings
+from helpers.single_flight import single_flight
 from clash_royale_api import ClashRoyaleMaintenanceError
 from redis_service import get_redis_json, set_redis_json, build_redis_key
 
@@ -24,9 +25,13 @@ async def get_cards(cr_api: CrApi, redis_conn: RedConn):
             return cached_cards
 
         # If not cached, fetch them from Clash Royale and cache them
-        cards = await cr_api.get_cards()
-        await set_redis_json(redis_conn, key, cards, ttl=settings.CACHE_TTL_CARDS)
-        return cards
+        async def fetch_and_cache():
+            cards = await cr_api.get_cards()
+            await set_redis_json(redis_conn, key, cards, ttl=settings.CACHE_TTL_CARDS)
+            return cards
+
+        # Concurrent misses share one Clash Royale API call
+        return await single_flight(key, fetch_and_cache)
 
     except ClashRoyaleMaintenanceError as e:
         raise HTTPException(status_code=e.code, detail=e.detail)
@@ -1,10 +1,13 @@
+import asyncio
 import time
-from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi import APIRouter, HTTPException, Depends, Query, Response
 from fastapi_limiter.depends import RateLimiter
 from typing import Optional, List
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
 
 import httpx
+import orjson
 
 from core.deps import DbConn, CrApi, RedConn, require_tracked_player
 from core.settings import settings
@@ -14,14 +17,23 @@ from helpers.validate import (
     validate_game_modes,
     ParamsRequestError,
 )
+from helpers.single_flight import single_flight
+from helpers.local_cache import local_cache_get, local_cache_set
+from helpers.stats_merge import merge_deck_and_card_stats, merge_daily_stats
 from models.schema import BetweenRequest, BattlesRequest
 from clash_royale_api import ClashRoyaleMaintenanceError
-from redis_service import get_redis_json, set_redis_json, build_redis_key
+from redis_service import (
+    get_redis_json,
+    get_redis_raw,
+    set_redis_json,
+    set_redis_json_many,
+    build_redis_key,
+)
 from mongo import (
     get_last_battles,
-    get_decks_win_percentage,
-    get_cards_win_percentage,
+    get_decks_and_cards_win_percentage,
     get_daily_stats,
+    get_player_first_battle,
 )
 
 router = APIRouter(
@@ -31,6 +43,445 @@ router = APIRouter(
 )
 
 
+def raw_json_response(fields: dict, raw_key: str, raw_json: bytes | str) -> Response:
+    """
+    Builds a JSON object response that embeds an already serialized JSON document.
+
+    The document is embedded as is, so neither a cached nor a freshly serialized
+    result has to go through parsing and FastAPI's encoder again.
+
+    Args:
+        fields (dict): Regular fields of the response object, serialized in order.
+        raw_key (str): Key under which the serialized document is embedded, as last field.
+        raw_json (bytes | str): The serialized JSON document.
+
+    Returns:
+        Response: JSON response of the form `{**fields, raw_key: <raw_json>}`
+    """
+
+    if isinstance(raw_json, str):
+        raw_json = raw_json.encode()
+
+    head = orjson.dumps(fields)[:-1]  # Object without its closing brace
+    separator = b"," if fields else b""
+    content = head + separator + orjson.dumps(raw_key) + b":" + raw_json + b"}"
+    return Response(content=content, media_type="application/json")
+
+
+def is_closed_date_range(
+    req: BetweenRequest, first_battle: datetime | None = None
+) -> bool:
+    """
+    Checks if the requested date range ended before yesterday in the request's timezone,
+    and the player's battles up to its end are stored already.
+
+    Battles are scraped every few minutes, the extra day of margin also covers
+    delayed scraping cycles. A newly tracked player's last battles only arrive with
+    the next scraping cycle and can be days old, so no range is closed before the
+    first of them is stored. Statistics of a closed range don't change anymore.
+
+    Args:
+        req (BetweenRequest): The validated date range and timezone of the request.
+        first_battle (datetime | None): Naive UTC time of the player's first stored battle,
+            None if none is stored (yet).
+
+    Returns:
+        bool: True if no new battles can fall into the date range, False otherwise
+    """
+
+    if first_battle is None:
+        return False
+
+    tz = ZoneInfo(req.timezone)
+    today = datetime.now(tz).date()
+    first_day = first_battle.replace(tzinfo=timezone.utc).astimezone(tz).date()
+    return first_day <= req.end_date < today - timedelta(days=1)
+
+
+async def get_first_battle(mongo_conn, player_tag: str) -> datetime | None:
+    """
+    Fetches the time of the player's first stored battle, which guards the caches of
+    closed date ranges (see `is_closed_date_range`).
+
+    Once a battle is stored, the time is also kept in-process, it only moves if
+    older battles than every scraped one are written.
+
+    Args:
+        mongo_conn (MongoConn): Active connection to the MongoDB database.
+        player_tag (str): The tag of the player.
+
+    Returns:
+        datetime | None: Naive UTC time of the first battle, None if none is stored yet
+    """
+
+    key = f"firstBattle:{player_tag}"
+    first_battle = local_cache_get(key)
+    if first_battle is None:
+        first_battle = await get_player_first_battle(mongo_conn, player_tag)
+        if first_battle is not None:
+            local_cache_set(
+                key, first_battle, ttl=settings.CACHE_TTL_LOCAL_CLOSED_RANGE_STATS
+            )
+    return first_battle
+
+
+def split_off_closed_range(req: BetweenRequest, first_battle: datetime | None = None):
+    """
+    Splits an open date range into its closed beginning and the still changing rest.
+
+    Args:
+        req (BetweenRequest): The validated date range and timezone of the request.
+        first_battle (datetime | None): Naive UTC time of the player's first stored battle.
+
+    Returns:
+        tuple[BetweenRequest, BetweenRequest] | None: The closed and the live part of the
+            date range, or None if the range is closed already or has no closed part
+            (e.g. the player's battles aren't stored yet).
+    """
+
+    today = datetime.now(ZoneInfo(req.timezone)).date()
+    last_closed_day = today - timedelta(days=2)
+
+    if is_closed_date_range(req, first_battle) or req.start_date > last_closed_day:
+        return None
+
+    closed_req = req.model_copy(update={"end_date": last_closed_day})
+    # The closed part is served from long-lived caches, so it has to be closed for the player
+    if not is_closed_date_range(closed_req, first_battle):
+        return None
+
+    live_req = req.model_copy(
+        update={"start_date": last_closed_day + timedelta(days=1)}
+    )
+    return closed_req, live_req
+
+
+def build_stats_params(player_tag: str, req: BetweenRequest, game_modes) -> dict:
+    """
+    Builds the parameters a date range statistic is cached under.
+
+    Args:
+        player_tag (str): The tag of the player the statistic belongs to.
+        req (BetweenRequest): The validated date range and timezone of the request.
+        game_modes (Optional[List[str]]): The validated game modes to filter by.
+
+    Returns:
+        dict: The cache key parameters
+    """
+
+    # TODO add input sanitization for all user-provided parameters
+    return {
+        "playerTag": player_tag,
+        "startDate": req.start_date,
+        "endDate": req.end_date,
+        "timezone": req.timezone,
+        "gameModes": game_modes,
+    }
+
+
+async def build_stats_cache_key(
+    redis_conn,
+    resource: str,
+    req: BetweenRequest,
+    params,
+    first_battle: datetime | None = None,
+) -> str:
+    """
+    Builds the cache key of a date range statistic.
+
+    Closed date ranges get a key outside of the versioning, so their cached result
+    survives the invalidation of every scraping cycle.
+
+    Args:
+        redis_conn (RedisConn): Active connection to the Redis cache.
+        resource (str): The cached resource, e.g. "playerDecks"
+        req (BetweenRequest): The validated date range and timezone of the request.
+        params (dict): The parameters the key is built from.
+        first_battle (datetime | None): Naive UTC time of the player's first stored battle.
+
+    Returns:
+        str: The Redis key
+    """
+
+    return await build_redis_key(
+        conn=redis_conn,
+        service="crApi",
+        resource=resource,
+        params=params,
+        versioned=not is_closed_date_range(req, first_battle),
+    )
+
+
+async def compute_deck_and_card_stats(
+    mongo_conn,
+    redis_conn,
+    player_tag: str,
+    req: BetweenRequest,
+    game_modes,
+    first_battle: datetime | None = None,
+):
+    """
+    Computes the deck and the card statistics of a date range.
+
+    For a rolling window, the closed beginning of the range is taken from its long-lived
+    cache (and computed and cached on a miss). Only the last days, which can still get
+    new battles, are aggregated from the battles and merged onto it.
+
+    Args:
+        mongo_conn (MongoConn): Active connection to the MongoDB database.
+        redis_conn (RedisConn): Active connection to the Redis cache.
+        player_tag (str): The tag of the player whose statistics are to be fetched.
+        req (BetweenRequest): The validated date range and timezone of the request.
+        game_modes (Optional[List[str]]): The validated game modes to filter by.
+        first_battle (datetime | None): Naive UTC time of the player's first stored battle.
+
+    Returns:
+        dict: Containing the `decks` and `cards` statistics
+    """
+
+    split = split_off_closed_range(req, first_battle)
+    if split is None:
+        return await get_decks_and_cards_win_percentage(
+            mongo_conn,
+            player_tag,
+            req.start_date,
+            req.end_date,
+            game_modes,
+            req.timezone,
+        )
+
+    closed_req, live_req = split
+
+    async def get_closed_stats():
+        closed_params = build_stats_params(player_tag, closed_req, game_modes)
+        decks_key, cards_key = await asyncio.gather(
+            build_stats_cache_key(
+                redis_conn, "playerDecks", closed_req, closed_params, first_battle
+            ),
+            build_stats_cache_key(
+                redis_conn, "playerCards", closed_req, closed_params, first_battle
+            ),
+        )
+        # Closed ranges can't change, so their parsed stats are also kept in-process
+        stats = local_cache_get(decks_key)
+        if stats is not None:
+            return stats
+
+        decks_json, cards_json = await asyncio.gather(
+            get_redis_raw(redis_conn, decks_key),
+            get_redis_raw(redis_conn, cards_key),
+        )
+        if decks_json is None or cards_json is None:
+            decks_json, cards_json = await fetch_and_cache_deck_and_card_stats(
+                mongo_conn, redis_conn, player_tag, closed_req, game_modes, first_battle
+            )
+        stats = {"decks": orjson.loads(decks_json), "cards": orjson.loads(cards_json)}
+        local_cache_set(
+            decks_key, stats, ttl=settings.CACHE_TTL_LOCAL_CLOSED_RANGE_STATS
+        )
+        return stats
+
+    # The closed part and the live days are independent, fetch them concurrently
+    closed_stats, live_stats = await asyncio.gather(
+        get_closed_stats(),
+        get_decks_and_cards_win_percentage(
+            mongo_conn,
+            player_tag,
+            live_req.start_date,
+            live_req.end_date,
+            game_modes,
+            live_req.timezone,
+        ),
+    )
+
+    return merge_deck_and_card_stats(closed_stats, live_stats)
+
+
+async def fetch_and_cache_deck_and_card_stats(
+    mongo_conn,
+    redis_conn,
+    player_tag: str,
+    req: BetweenRequest,
+    game_modes,
+    first_battle: datetime | None = None,
+):
+    """
+    Computes the deck and the card statistics in one aggregation and caches both.
+
+    The deck and card views request the same time range, so whichever is requested
+    first fills the cache of the other one as well. Concurrent requests for the same
+    statistics share one aggregation.
+
+    Args:
+        mongo_conn (MongoConn): Active connection to the MongoDB database.
+        redis_conn (RedisConn): Active connection to the Redis cache.
+        player_tag (str): The tag of the player whose statistics are to be fetched.
+        req (BetweenRequest): The validated date range and timezone of the request.
+        game_modes (Optional[List[str]]): The validated game modes to filter by.
+        first_battle (datetime | None): Naive UTC time of the player's first stored battle.
+
+    Returns:
+        tuple[bytes, bytes]: The serialized deck statistics and card statistics
+    """
+
+    params = build_stats_params(player_tag, req, game_modes)
+    decks_key, cards_key = await asyncio.gather(
+        build_stats_cache_key(redis_conn, "playerDecks", req, params, first_battle),
+        build_stats_cache_key(redis_conn, "playerCards", req, params, first_battle),
+    )
+
+    async def compute_and_cache():
+        stats = await compute_deck_and_card_stats(
+            mongo_conn, redis_conn, player_tag, req, game_modes, first_battle
+        )
+
+        # Closed ranges can't change anymore and are kept much longer
+        closed = is_closed_date_range(req, first_battle)
+        decks_ttl = (
+            settings.CACHE_TTL_CLOSED_RANGE_STATS
+            if closed
+            else settings.CACHE_TTL_DECK_STATS
+        )
+        cards_ttl = (
+            settings.CACHE_TTL_CLOSED_RANGE_STATS
+            if closed
+            else settings.CACHE_TTL_CARD_STATS
+        )
+
+        decks_json, cards_json = await set_redis_json_many(
+            redis_conn,
+            [
+                (decks_key, stats["decks"], decks_ttl),
+                (cards_key, stats["cards"], cards_ttl),
+            ],
+        )
+        return decks_json, cards_json
+
+    # Both endpoints run the same aggregation, so they share the decks key
+    return await single_flight(decks_key, compute_and_cache)
+
+
+async def compute_daily_stats(
+    mongo_conn,
+    redis_conn,
+    player_tag: str,
+    req: BetweenRequest,
+    game_modes,
+    first_battle: datetime | None = None,
+):
+    """
+    Computes the daily statistics of a date range.
+
+    For a rolling window, the days of the closed beginning of the range are taken from
+    their long-lived cache (and computed and cached on a miss). Only the last days,
+    which can still get new battles, are aggregated from the battles.
+
+    Args:
+        mongo_conn (MongoConn): Active connection to the MongoDB database.
+        redis_conn (RedisConn): Active connection to the Redis cache.
+        player_tag (str): The tag of the player whose statistics are to be fetched.
+        req (BetweenRequest): The validated date range and timezone of the request.
+        game_modes (Optional[List[str]]): The validated game modes to filter by.
+        first_battle (datetime | None): Naive UTC time of the player's first stored battle.
+
+    Returns:
+        dict: Containing the `daily` statistics and the `totalBattles`
+    """
+
+    split = split_off_closed_range(req, first_battle)
+    if split is None:
+        return await get_daily_stats(
+            mongo_conn,
+            player_tag,
+            req.start_date,
+            req.end_date,
+            game_modes,
+            req.timezone,
+        )
+
+    closed_req, live_req = split
+
+    async def get_closed_stats():
+        closed_params = build_stats_params(player_tag, closed_req, game_modes)
+        key = await build_stats_cache_key(
+            redis_conn, "dailyStats", closed_req, closed_params, first_battle
+        )
+        # Closed ranges can't change, so their stats are also kept in-process
+        stats = local_cache_get(key)
+        if stats is not None:
+            return stats
+
+        stats = await get_redis_json(redis_conn, key)
+        if stats is None:
+            stats = await fetch_and_cache_daily_stats(
+                mongo_conn, redis_conn, player_tag, closed_req, game_modes, first_battle
+            )
+        local_cache_set(key, stats, ttl=settings.CACHE_TTL_LOCAL_CLOSED_RANGE_STATS)
+        return stats
+
+    # The closed part and the live days are independent, fetch them concurrently
+    closed_stats, live_stats = await asyncio.gather(
+        get_closed_stats(),
+        get_daily_stats(
+            mongo_conn,
+            player_tag,
+            live_req.start_date,
+            live_req.end_date,
+            game_modes,
+            live_req.timezone,
+        ),
+    )
+
+    return merge_daily_stats(closed_stats, live_stats)
+
+
+async def fetch_and_cache_daily_stats(
+    mongo_conn,
+    redis_conn,
+    player_tag: str,
+    req: BetweenRequest,
+    game_modes,
+    first_battle: datetime | None = None,
+):
+    """
+    Computes the daily statistics of a date range and caches them.
+
+    Concurrent requests for the same statistics share one computation.
+
+    Args:
+        mongo_conn (MongoConn): Active connection to the MongoDB database.
+        redis_conn (RedisConn): Active connection to the Redis cache.
+        player_tag (str): The tag of the player whose statistics are to be fetched.
+        req (BetweenRequest): The validated date range and timezone of the request.
+        game_modes (Optional[List[str]]): The validated game modes to filter by.
+        first_battle (datetime | None): Naive UTC time of the player's first stored battle.
+
+    Returns:
+        dict: Containing the `daily` statistics and the `totalBattles`
+    """
+
+    params = build_stats_params(player_tag, req, game_modes)
+    key = await build_stats_cache_key(
+        redis_conn, "dailyStats", req, params, first_battle
+    )
+
+    async def compute_and_cache():
+        stats = await compute_daily_stats(
+            mongo_conn, redis_conn, player_tag, req, game_modes, first_battle
+        )
+
+        # Closed ranges can't change anymore and are kept much longer
+        ttl = (
+            settings.CACHE_TTL_CLOSED_RANGE_STATS
+            if is_closed_date_range(req, first_battle)
+            else settings.CACHE_TTL_PLAYER_BATTLE_STATS
+        )
+        await set_redis_json(redis_conn, key, stats, ttl=ttl)
+        return stats
+
+    return await single_flight(key, compute_and_cache)
+
+
 @router.get(
     "/{player_tag}/profile", dependencies=[Depends(RateLimiter(times=10, seconds=60))]
 )
@@ -48,11 +499,15 @@ async def get_player_profile(player_tag: str, cr_api: CrApi, redis_conn: RedConn
         if cached_stats is not None:
             return cached_stats
 
-        player_stats = await cr_api.get_player_info(player_tag)
-        await set_redis_json(
-            redis_conn, key, player_stats, ttl=settings.CACHE_TTL_PLAYER_PROFILE
-        )
-        return player_stats
+        async def fetch_and_cache():
+            player_stats = await cr_api.get_player_info(player_tag)
+            await set_redis_json(
+                redis_conn, key, player_stats, ttl=settings.CACHE_TTL_PLAYER_PROFILE
+            )
+            return player_stats
+
+        # Concurrent misses for the same profile share one Clash Royale API call
+        return await single_flight(key, fetch_and_cache)
 
     except ClashRoyaleMaintenanceError as e:
         raise HTTPException(status_code=e.code, detail=e.detail)
@@ -98,10 +553,12 @@ async def last_battles(
         key = await build_redis_key(
             conn=redis_conn, service="crApi", resource="playerBattles", params=params
         )
-        cached_battles = await get_redis_json(redis_conn, key)
+        cached_battles = await get_redis_raw(redis_conn, key)
 
         if cached_battles is not None:
-            return {"player_tag": player_tag, "last_battles": cached_battles}
+            return raw_json_response(
+                {"player_tag": player_tag}, "last_battles", cached_battles
+            )
 
         battles = await get_last_battles(mongo_conn, player_tag, cutoff, req.limit)
 
@@ -110,8 +567,12 @@ async def last_battles(
                 status_code=404, detail=f"No battles found for {player_tag}"
             )
 
-        await set_redis_json(redis_conn, key, battles, ttl=settings.CACHE_TTL_BATTLES)
-        return {"player_tag": player_tag, "last_battles": battles}
+        battles_json = await set_redis_json(
+            redis_conn, key, battles, ttl=settings.CACHE_TTL_BATTLES
+        )
+        return raw_json_response(
+            {"player_tag": player_tag}, "last_battles", battles_json
+        )
 
     except ParamsRequestError as e:
         raise HTTPException(status_code=e.code, detail=e.detail)
@@ -134,46 +595,29 @@ async def deck_percentage_stats(
     try:
         validate_between_request(req)
         validated_game_modes = await validate_game_modes(redis_conn, game_modes)
-        # TODO add input sanitization for all user-provided parameters
-        params = {
-            "playerTag": player_tag,
-            "startDate": req.start_date,
-            "endDate": req.end_date,
-            "timezone": req.timezone,
-            "gameModes": validated_game_modes,
-        }
-        key = await build_redis_key(
-            conn=redis_conn, service="crApi", resource="playerDecks", params=params
+        first_battle = await get_first_battle(mongo_conn, player_tag)
+        params = build_stats_params(player_tag, req, validated_game_modes)
+        key = await build_stats_cache_key(
+            redis_conn, "playerDecks", req, params, first_battle
         )
-        cached_decks = await get_redis_json(redis_conn, key)
+        cached_decks = await get_redis_raw(redis_conn, key)
 
         if cached_decks is not None:
-            return {
-                "player_tag": player_tag,
-                "game_modes": validated_game_modes,
-                "deck_statistics": cached_decks,
-            }
+            return raw_json_response(
+                {"player_tag": player_tag, "game_modes": validated_game_modes},
+                "deck_statistics",
+                cached_decks,
+            )
 
-        decks = await get_decks_win_percentage(
-            mongo_conn,
-            player_tag,
-            req.start_date,
-            req.end_date,
-            validated_game_modes,
-            req.timezone,
+        decks, _ = await fetch_and_cache_deck_and_card_stats(
+            mongo_conn, redis_conn, player_tag, req, validated_game_modes, first_battle
         )
 
-        if not decks:
-            raise HTTPException(
-                status_code=404, detail=f"No decks found for {player_tag}"
-            )
-
-        await set_redis_json(redis_conn, key, decks, ttl=settings.CACHE_TTL_DECK_STATS)
-        return {
-            "player_tag": player_tag,
-            "game_modes": validated_game_modes,
-            "deck_statistics": decks,
-        }
+        return raw_json_response(
+            {"player_tag": player_tag, "game_modes": validated_game_modes},
+            "deck_statistics",
+            decks,
+        )
 
     except ParamsRequestError as e:
         raise HTTPException(status_code=e.code, detail=e.detail)
@@ -197,45 +641,29 @@ async def card_percentage_stats(
         validate_between_request(req)
         validated_game_modes = await validate_game_modes(redis_conn, game_modes)
 
-        params = {
-            "playerTag": player_tag,
-            "startDate": req.start_date,
-            "endDate": req.end_date,
-            "timezone": req.timezone,
-            "gameModes": validated_game_modes,
-        }
-        key = await build_redis_key(
-            conn=redis_conn, service="crApi", resource="playerCards", params=params
+        first_battle = await get_first_battle(mongo_conn, player_tag)
+        params = build_stats_params(player_tag, req, validated_game_modes)
+        key = await build_stats_cache_key(
+            redis_conn, "playerCards", req, params, first_battle
         )
-        cached_cards = await get_redis_json(redis_conn, key)
+        cached_cards = await get_redis_raw(redis_conn, key)
 
         if cached_cards is not None:
-            return {
-                "player_tag": player_tag,
-                "game_modes": validated_game_modes,
-                "card_statistics": cached_cards,
-            }
+            return raw_json_response(
+                {"player_tag": player_tag, "game_modes": validated_game_modes},
+                "card_statistics",
+                cached_cards,
+            )
 
-        cards = await get_cards_win_percentage(
-            mongo_conn,
-            player_tag,
-            req.start_date,
-            req.end_date,
-            validated_game_modes,
-            req.timezone,
+        _, cards = await fetch_and_cache_deck_and_card_stats(
+            mongo_conn, redis_conn, player_tag, req, validated_game_modes, first_battle
         )
 
-        if not cards:
-            raise HTTPException(
-                status_code=404, detail=f"No cards found for {player_tag}"
-            )
-
-        await set_redis_json(redis_conn, key, cards, ttl=settings.CACHE_TTL_CARD_STATS)
-        return {
-            "player_tag": player_tag,
-            "game_modes": validated_game_modes,
-            "card_statistics": cards,
-        }
+        return raw_json_response(
+            {"player_tag": player_tag, "game_modes": validated_game_modes},
+            "card_statistics",
+            cards,
+        )
 
     except ParamsRequestError as e:
         raise HTTPException(status_code=e.code, detail=e.detail)
@@ -259,15 +687,10 @@ async def daily_player_statistics(
         validate_between_request(req)
         validated_game_modes = await validate_game_modes(redis_conn, game_modes)
 
-        params = {
-            "playerTag": player_tag,
-            "startDate": req.start_date,
-            "endDate": req.end_date,
-            "timezone": req.timezone,
-            "gameModes": validated_game_modes,
-        }
-        key = await build_redis_key(
-            conn=redis_conn, service="crApi", resource="dailyStats", params=params
+        first_battle = await get_first_battle(mongo_conn, player_tag)
+        params = build_stats_params(player_tag, req, validated_game_modes)
+        key = await build_stats_cache_key(
+            redis_conn, "dailyStats", req, params, first_battle
         )
         cached_stats = await get_redis_json(redis_conn, key)
 
@@ -278,13 +701,8 @@ async def daily_player_statistics(
                 "daily_statistics": cached_stats,
             }
 
-        stats = await get_daily_stats(
-            mongo_conn,
-            player_tag,
-            req.start_date,
-            req.end_date,
-            validated_game_modes,
-            req.timezone,
+        stats = await fetch_and_cache_daily_stats(
+            mongo_conn, redis_conn, player_tag, req, validated_game_modes, first_battle
         )
 
         if not stats:
@@ -292,9 +710,6 @@ async def daily_player_statistics(
                 status_code=404, detail=f"No battles found for {player_tag}"
             )
 
-        await set_redis_json(
-            redis_conn, key, stats, ttl=settings.CACHE_TTL_PLAYER_BATTLE_STATS
-        )
         return {
             "player_tag": player_tag,
             "game_modes": validated_game_modes,
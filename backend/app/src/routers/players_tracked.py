@@ -1,12 +1,20 @@
+import logging
 from fastapi import APIRouter, HTTPException, Depends
 from fastapi_limiter.depends import RateLimiter
 from core.deps import (
     DbConn,
     CrApi,
+    RedConn,
     require_tracked_player,
     require_auth,
 )
 from clash_royale_api import ClashRoyaleMaintenanceError
+from redis_service import (
+    RedisConn,
+    invalidate_redis_set,
+    TRACKED_PLAYER_TAGS_KEY,
+    TRACKED_PLAYER_TAGS_GENERATION_KEY,
+)
 from mongo import (
     get_tracked_players,
     insert_tracked_player,
@@ -14,9 +22,31 @@ from mongo import (
     get_players_count,
 )
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(prefix="/players", tags=["Tracked Players"])
 
 
+async def invalidate_tracked_players_cache(redis_conn: RedisConn):
+    """
+    Delete the cached tracked player tags, so the data scraper reloads them from Mongo.
+
+    The generation bump makes a reload that already read Mongo before this change skip
+    its write, instead of caching the outdated tags as up to date.
+
+    Errors are only logged, the cache entry then expires via its TTL.
+
+    Args:
+        redis_conn (RedisConn): Redis connection holding the cached tag set.
+    """
+    try:
+        await invalidate_redis_set(
+            redis_conn, TRACKED_PLAYER_TAGS_KEY, TRACKED_PLAYER_TAGS_GENERATION_KEY
+        )
+    except Exception as e:
+        logger.error("[CACHE] invalidating the tracked players cache: %s", e)
+
+
 @router.get("", dependencies=[Depends(RateLimiter(times=15, seconds=60))])
 async def list_tracked_players(mongo_conn: DbConn):
     try:
@@ -40,7 +70,9 @@ async def fetch_tracked_player_count(mongo_conn: DbConn):
 
 
 @router.post("/{player_tag}", dependencies=[Depends(RateLimiter(times=3, seconds=60))])
-async def add_tracked_player(player_tag: str, mongo_conn: DbConn, cr_api: CrApi):
+async def add_tracked_player(
+    player_tag: str, mongo_conn: DbConn, redis_conn: RedConn, cr_api: CrApi
+):
     try:
         player = await cr_api.check_existing_player(player_tag)
         # API returns empty response when player doesn't exist
@@ -53,6 +85,8 @@ async def add_tracked_player(player_tag: str, mongo_conn: DbConn, cr_api: CrApi)
 
     try:
         status_insert = await insert_tracked_player(mongo_conn, player_tag, player)
+        if status_insert != "already_tracked":
+            await invalidate_tracked_players_cache(redis_conn)
 
         if status_insert == "reactivated":
             return {"status": "Player is now being tracked again", "tag": player_tag}
@@ -74,6 +108,7 @@ async def add_tracked_player(player_tag: str, mongo_conn: DbConn, cr_api: CrApi)
 )
 async def remove_tracked_player(
     mongo_conn: DbConn,
+    redis_conn: RedConn,
     _=Depends(require_auth),
     player_tag: str = Depends(require_tracked_player),
 ):
@@ -89,6 +124,7 @@ async def remove_tracked_player(
                 detail=f"Player with tag {player_tag} is not being tracked",
             )
 
+        await invalidate_tracked_players_cache(redis_conn)
         return {"status": "Player is not being tracked anymore", "tag": player_tag}
 
     except HTTPException:
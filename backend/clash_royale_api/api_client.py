@@ -1,4 +1,5 @@
 import httpx
+from urllib.parse import quote
 
 CLASH_BASE_URL = "https://api.clashroyale.com/v1"
 ALPHABET = set("0289PYLQGRJCUV")  # Supercell tag alphabet
@@ -20,7 +21,8 @@ class ClashRoyaleMaintenanceError(Exception):
 class ClashRoyaleAPI:
     """
     Async Clash Royale API client (single API key, no rotation).
-    Reuses one httpx.AsyncClient per instance for connection pooling.
+    Reuses one httpx.AsyncClient per instance for connection pooling, with HTTP/2
+    enabled so concurrent requests are multiplexed over a single connection.
     """
 
     def __init__(
@@ -32,6 +34,8 @@ class ClashRoyaleAPI:
         self._base_url = base_url.rstrip("/")  # Always remove trailing "/" of base url
         self._client: httpx.AsyncClient = httpx.AsyncClient(
             base_url=self._base_url,
+            http2=True,  # Falls back to HTTP/1.1 if the server doesn't negotiate h2
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
             timeout=httpx.Timeout(
                 connect=timeout_s, read=timeout_s, write=timeout_s, pool=timeout_s
             ),
@@ -80,8 +84,9 @@ class ClashRoyaleAPI:
         """
         URL encodes a Clash Royale player tag for use in API requests.
 
-        Replaces the '#' character with '%23' to make the player tag URL-safe
-        for use in HTTP requests to the Clash Royale API.
+        Percent-encodes the '#' character as '%23', and any other character that
+        isn't URL-safe (e.g. '/' or '?'), so the tag stays a single path segment
+        in HTTP requests to the Clash Royale API.
 
         Args:
             player_tag (str): The player tag starting with '#' (e.g., "#YYRJQY28")
@@ -89,24 +94,24 @@ class ClashRoyaleAPI:
         Returns:
             str: URL-encoded player tag (e.g., "%23YYRJQY28")
         """
-        return player_tag.replace("#", "%23")
+        return quote(player_tag, safe="")
 
     @staticmethod
-    def _check_maintenance(response):
+    def _check_maintenance(response: httpx.Response):
         """
         Checks if the Clash Royale API is in maintenance mode.
 
+        The API answers with HTTP 503 and the reason "inMaintenance" while in maintenance.
+        Only the status code and the raw body bytes are inspected, the body is never
+        JSON decoded.
+
         Args:
-            response (Any): The API response (usually a list of dicts)
+            response (httpx.Response): The raw HTTP response
 
         Raises:
             ClashRoyaleMaintenanceError: If the API is in maintenance mode.
         """
-        if (
-            isinstance(response, list)
-            and len(response) > 0
-            and response[0].get("reason") == "inMaintenance"
-        ):
+        if response.status_code == 503 and b"inMaintenance" in response.content:
             raise ClashRoyaleMaintenanceError(
                 "Clash Royale API is in maintenance mode. Try again later."
             )
@@ -128,6 +133,7 @@ class ClashRoyaleAPI:
 
         Raises:
             RuntimeError: If the HTTP client is closed
+            ClashRoyaleMaintenanceError: If the API is in maintenance mode
             HTTPStatusError: If the API request fails (4xx/5xx status codes)
             RequestException: If there are network connectivity issues
         """
@@ -141,11 +147,11 @@ class ClashRoyaleAPI:
             endpoint,
             headers={"Authorization": f"Bearer {self._api_key}"},
         )
-        resp.raise_for_status()  # will raise httpx.HTTPStatusError on 4xx/5xx
-
-        # Check for maintenance
+        # Check for maintenance before any other status handling or decoding
         self._check_maintenance(resp)
 
+        resp.raise_for_status()  # will raise httpx.HTTPStatusError on 4xx/5xx
+
         return resp.json()
 
     async def check_connection(self):
@@ -1,10 +1,16 @@
 from datetime import datetime, timedelta
 import copy
+import logging
 
+logger = logging.getLogger(__name__)
 
-def validate_battle_log_structure(battle_logs):
+
+def validate_battle_logs(battle_logs):
     """
-    Validates the API response if it is in the correct form and syntax.
+    Validates the API response in one pass, both its structure and its content.
+
+    Checks that the response is a non-empty list whose first battle is a dictionary
+    with all required fields, and that the team and opponent players have a cards list.
 
     Args:
         battle_logs: The response from the Clash Royale API
@@ -13,75 +19,51 @@ def validate_battle_log_structure(battle_logs):
         bool: True if the response is valid, False otherwise
     """
 
-    # Check if battle_logs is None or empty
-    if not battle_logs:
-        return False
-
-    # Check if it's a list (expected format)
-    if not isinstance(battle_logs, list):
-        return False
-
-    # Check if the list is empty
-    if len(battle_logs) == 0:
+    # Check if battle_logs is None/empty or not a list (expected format)
+    if not battle_logs or not isinstance(battle_logs, list):
         return False
 
-    # Validate first battle log structure
+    # Validate first battle log structure and content
     first_battle = battle_logs[0]
 
     # Check if it's a dictionary
     if not isinstance(first_battle, dict):
-        print(f"[VALIDATION] Expected battle to be dict, got {type(first_battle)}")
+        logger.warning("Expected battle to be dict, got %s", type(first_battle))
         return False
 
-    return True
-
-
-def validate_battle_log_content(battle_logs):
-    """
-    Validates the API response to ensure it contains valid battle log data.
-
-    Args:
-        battle_logs: The response from the Clash Royale API
-
-    Returns:
-        bool: True if the response is valid, False otherwise
-    """
-
-    # Validate first battle log content
-    first_battle = battle_logs[0]
-
     # Check for required fields
     required_fields = ["battleTime", "team", "opponent", "arena", "gameMode"]
     for field in required_fields:
         if field not in first_battle:
-            print(f"[VALIDATION] Missing required field: {field}")
+            logger.warning("Missing required field: %s", field)
             return False
 
     # Validate team and opponent structure
-    team = first_battle.get("team")
-    opponent = first_battle.get("opponent")
+    team = first_battle["team"]
+    opponent = first_battle["opponent"]
 
     if not isinstance(team, list) or not isinstance(opponent, list):
-        print("[VALIDATION] Team or opponent is not a list")
+        logger.warning("Team or opponent is not a list")
         return False
 
-    if len(team) == 0 or len(opponent) == 0:
-        print("[VALIDATION] Team or opponent list is empty")
+    if not team or not opponent:
+        logger.warning("Team or opponent list is empty")
         return False
 
     # Check if team and opponent players have required fields
-    for player in team + opponent:
-        if not isinstance(player, dict):
-            print("[VALIDATION] Player is not a dictionary")
-            return False
+    for players in (team, opponent):
+        for player in players:
+            if not isinstance(player, dict):
+                logger.warning("Player is not a dictionary")
+                return False
 
-        if "cards" not in player:
-            print("[VALIDATION] Player missing cards field")
-            return False
+            if "cards" not in player:
+                logger.warning("Player missing cards field")
+                return False
 
-        if not isinstance(player["cards"], list):
-            print("[VALIDATION] Player cards is not a list")
-            return False
+            if not isinstance(player["cards"], list):
+                logger.warning("Player cards is not a list")
+                return False
 
     return True
 
@@ -187,21 +169,108 @@ def determine_game_result(battle):
     return "Draw"
 
 
+def extract_reference_player_cards(battle, player_tag):
+    """
+    Extracts the reference player's deck cards in the normalized form the stats
+    aggregations group by.
+
+    Each card is mapped to `id`, `level` (defaults to 1) and `evolutionLevel`
+    (defaults to 0, which is the default for non-evolution cards). The name stays
+    with the full team entry only, clients resolve it from the card id.
+    The cards are sorted by evolution level (descending), then id, the order in
+    which decks are displayed, so the aggregations don't have to sort them.
+
+    Args:
+        battle (dict): Cleaned battle log dictionary
+        player_tag (str): The tag of the reference player of the battle
+
+    Returns:
+        list: The normalized and sorted cards of the reference player, empty if the player isn't found
+    """
+
+    # Reference player is always found in team
+    for player in battle.get("team") or []:
+        if player.get("tag") == player_tag:
+            cards = [
+                {
+                    "id": card.get("id"),
+                    "level": card.get("level") or 1,
+                    "evolutionLevel": int(card.get("evolutionLevel") or 0),
+                }
+                for card in player.get("cards") or []
+            ]
+            cards.sort(key=lambda card: (-card["evolutionLevel"], card["id"] or 0))
+            return cards
+
+    return []
+
+
+def build_deck_key(cards):
+    """
+    Builds a short key that identifies a deck regardless of card levels.
+
+    The already sorted cards are joined as "<id>:<evolutionLevel>;" per card,
+    e.g. "26000000:1;26000001:0;...". The deck stats aggregation builds the same key
+    for battles stored without it, so both formats have to stay in sync.
+
+    Args:
+        cards (list): Normalized and sorted deck cards, see `extract_reference_player_cards`
+
+    Returns:
+        str: The deck key
+    """
+
+    return "".join(
+        f"{card['id'] if card['id'] is not None else ''}:{card['evolutionLevel']};"
+        for card in cards
+    )
+
+
+def extract_reference_player_elixir_leaked(battle, player_tag):
+    """
+    Extracts the elixir the reference player leaked as a float.
+
+    The daily stats sum this field directly, so missing or malformed values
+    are stored as 0 instead of being converted on every read.
+
+    Args:
+        battle (dict): Cleaned battle log dictionary
+        player_tag (str): The tag of the reference player of the battle
+
+    Returns:
+        float: The leaked elixir of the reference player, 0 if unknown
+    """
+
+    for player in battle.get("team") or []:
+        if player.get("tag") == player_tag:
+            try:
+                return float(player.get("elixirLeaked") or 0)
+            except (TypeError, ValueError):
+                return 0.0
+
+    return 0.0
+
+
 def clean_battle_log_list(battle_logs, player_tag):
     """
     Processes and cleans a list of battle logs from the Clash Royale API.
 
     Adds metadata, converts timestamps, determines game results, and removes
-    unnecessary fields to prepare the data for database storage.
+    unnecessary fields to prepare the data for database storage. The player's
+    name is extracted in the same traversal.
 
     Args:
-        battle_logs (list): List of raw battle log dictionaries from the API
+        battle_logs (list): List of raw battle log dictionaries (newest first) from the API
         player_tag (str): The player tag to use as reference for the battles
 
     Returns:
-        list: List of cleaned and processed battle log dictionaries
+        tuple[list, str]:
+            - List of cleaned and processed battle log dictionaries
+            - The player's name if found, otherwise the given `player_tag`
     """
 
+    player_name = None
+
     i = 0
     while i < len(battle_logs):
         battle = battle_logs[i]
@@ -215,6 +284,17 @@ def clean_battle_log_list(battle_logs, player_tag):
             )
             continue  # move to the next battle, which is the first battle of the duel
 
+        # The newest battle that contains the player is checked for their name, so chances are
+        # this is the actual current name. Easiest way to get the actual name would be to use
+        # the get_player_info of the clash_royale_api module, but extracting it from the battle
+        # log, which is already being fetched, saves one API-call per cycle per player
+        if player_name is None:
+            # Reference player is always found in team
+            for player in battle.get("team"):
+                if player.get("tag") == player_tag:
+                    player_name = player.get("name")
+                    break
+
         # Add a reference player tag to each battle
         # Tag combined with time is unique identifier for each battle
         battle["referencePlayerTag"] = player_tag
@@ -230,6 +310,20 @@ def clean_battle_log_list(battle_logs, player_tag):
 
         # See if game ended in victory/defeat or draw
         battle["gameResult"] = determine_game_result(battle)
+        # Stored as 0/1, so the aggregations sum wins without a condition per battle
+        battle["isWin"] = 1 if battle["gameResult"] == "Victory" else 0
+
+        # Store the reference player's deck next to the battle, so aggregations
+        # don't have to search the team array for the player on every document
+        battle["referencePlayerCards"] = extract_reference_player_cards(
+            battle, player_tag
+        )
+        battle["referencePlayerDeckKey"] = build_deck_key(
+            battle["referencePlayerCards"]
+        )
+        battle["referencePlayerElixirLeaked"] = extract_reference_player_elixir_leaked(
+            battle, player_tag
+        )
 
         # Remove the unnecessary stats from each battle
         keys_to_remove = [
@@ -251,7 +345,8 @@ def clean_battle_log_list(battle_logs, player_tag):
 
         i += 1  # move to the next battle
 
-    return battle_logs
+    # Default to the tag if the name couldn't be found
+    return battle_logs, player_name or player_tag
 
 
 def extract_duel_battles(battle):
@@ -358,29 +453,3 @@ def clean_battle(battle):
         remove_unnecessary_card_fields(player.get("supportCards"))
 
         player.pop("globalRank", None)
-
-
-def get_player_name(battles, player_tag):
-    """
-    Extracts the player's name from the most recent battle log entry.
-
-    Args:
-        battles (list[dict]): List of battle dictionaries (newest first) as returned by the Clash Royale API.
-        player_tag (str): The tag of the player whose name is being retrieved.
-
-    Returns:
-        str: The player's name if found, otherwise the given `player_tag`.
-    """
-
-    # battles[0] is the newest/earliest battle, so chances are this is the actual current name.
-    # Easiest way to get the actual name would be to use the get_player_info of the clash_royale_api module,
-    # but extracting it from the battle log, which is already being fetched, saves one API-call per cycle per player
-    battle = battles[0]  # Take first battle of battles in the list
-
-    # Reference player is always found in team
-    for player in battle.get("team"):
-        # Check if it's the reference player
-        if player.get("tag") == player_tag:
-            return player.get("name")
-
-    return player_tag  # Default to the tag if the name couldn't be found
@@ -1,30 +1,42 @@
 from clean import (
     clean_battle_log_list,
-    validate_battle_log_structure,
-    validate_battle_log_content,
-    get_player_name,
+    validate_battle_logs,
 )
 from game_modes import UniqueGameModes
 from clash_royale_api import ClashRoyaleAPI, ClashRoyaleMaintenanceError
 from mongo import MongoConn
 from mongo import (
     insert_battles,
+    ensure_battle_indexes,
+    ensure_player_summaries,
+    ensure_player_indexes,
+    backfill_reference_player_decks,
     set_player_name,
     insert_game_modes,
     get_battles_count,
     print_first_battles,
 )
 from mongo import get_tracked_player_tags
-from redis_service import RedisConn, build_redis_key, set_redis_json
+from redis_service import (
+    RedisConn,
+    build_redis_key,
+    get_redis_set,
+    get_redis_generation,
+    set_redis_set,
+    TRACKED_PLAYER_TAGS_KEY,
+    TRACKED_PLAYER_TAGS_GENERATION_KEY,
+)
 from api_rate_limiter import ApiRateLimiter
+from log_config import setup_logging
 from settings import settings
 
 import httpx
 import time
 import asyncio
+import logging
+import random
 
-
-# TODO switch to logger
+logger = logging.getLogger("data_scraper")
 
 
 async def init():
@@ -52,8 +64,17 @@ async def init():
     # Retry MongoDB
     mongo_conn = MongoConn(app_name=settings.MONGO_CLIENT_NAME)
     await retry_async(mongo_conn.connect, name="MongoDB")
-
-    print("[INFO] Successfully connected to all services")
+    # Unique battle key, duplicates are rejected on insert instead of checked beforehand
+    await ensure_battle_indexes(mongo_conn)
+    await ensure_player_indexes(mongo_conn)
+    # One-off build of the player summaries, only a marker lookup afterwards
+    await ensure_player_summaries(mongo_conn)
+    # Battles stored before the deck was denormalized, runs once
+    backfilled = await backfill_reference_player_decks(mongo_conn)
+    if backfilled:
+        logger.info("Stored the reference player deck on %s older battles", backfilled)
+
+    logger.info("Successfully connected to all services")
     # Upon successful connection, return all three
     return cr_api, redis_conn, mongo_conn
 
@@ -86,14 +107,14 @@ async def retry_async(func, name):
         try:
             return await func()
         except Exception as e:
-            print(
-                f"[ERROR] Failed to connect to {name} (attempt {attempt}/{retries}): {e}"
+            logger.error(
+                "Failed to connect to %s (attempt %d/%d): %s", name, attempt, retries, e
             )
             if attempt < retries:
                 await asyncio.sleep(delay)
             else:
-                print(
-                    f"[ERROR] Exiting after {retries} failed attempts to connect to {name}"
+                logger.error(
+                    "Exiting after %d failed attempts to connect to %s", retries, name
                 )
                 exit(1)
 
@@ -101,6 +122,51 @@ async def retry_async(func, name):
 api_rl = ApiRateLimiter(per_second=settings.REQUESTS_PER_SECOND)
 
 
+def compute_backoff(attempt: int) -> float:
+    """
+    Exponential backoff with full jitter for the given retry attempt.
+
+    Picks a random delay between 0 and `BASE_BACKOFF * 2**attempt` (capped at
+    `MAX_BACKOFF`), so players that failed at the same time don't retry in lockstep.
+
+    Args:
+        attempt (int): Zero-based number of the retry attempt.
+
+    Returns:
+        float: Seconds to wait before the next attempt.
+    """
+
+    return random.uniform(
+        0, min(settings.MAX_BACKOFF, settings.BASE_BACKOFF * (2**attempt))
+    )
+
+
+def parse_retry_after(response: httpx.Response):
+    """
+    Read the delay in seconds from a response's `Retry-After` header.
+
+    Only the delta-seconds form is supported, an HTTP-date or a missing/invalid
+    header returns None so the caller can fall back to its own backoff.
+
+    Args:
+        response (httpx.Response): The response of the failed request.
+
+    Returns:
+        float | None: Seconds to wait (capped at `MAX_BACKOFF`), or None if not usable.
+    """
+
+    retry_after = response.headers.get("Retry-After")
+    if not retry_after:
+        return None
+    try:
+        seconds = float(retry_after)
+    except ValueError:
+        return None
+    if seconds < 0:
+        return None
+    return min(seconds, settings.MAX_BACKOFF)
+
+
 async def process_player(
     player_tag: str,
     mode_store: UniqueGameModes,
@@ -110,7 +176,7 @@ async def process_player(
     """Fetch, validate, clean, and persist the latest battles for a single player.
 
     The API call is throttled by a global rate limiter (max REQUESTS_PER_SECOND).
-    Transient HTTP/network errors are retried with exponential backoff.
+    Transient HTTP/network errors are retried with jittered exponential backoff.
     A maintenance error intentionally propagates to abort the entire cycle.
 
     Args:
@@ -126,7 +192,7 @@ async def process_player(
         ClashRoyaleMaintenanceError: Propagated to stop the current cycle for all players.
     """
 
-    print(f"[INFO] Running data scraping cycle for Player {player_tag} ...")
+    logger.info("Running data scraping cycle for Player %s ...", player_tag)
     attempt = 0
     while True:
         try:
@@ -136,22 +202,18 @@ async def process_player(
 
             # Check if we got any battle logs
             if not battle_logs:
-                print(f"[WARNING] No battle logs returned for player {player_tag}")
+                logger.warning("No battle logs returned for player %s", player_tag)
                 return
 
             # Check if the response has all the necessary fields and correct content
-            if not validate_battle_log_structure(
-                battle_logs
-            ) or not validate_battle_log_content(battle_logs):
-                print(f"[ERROR] Battle logs for Player {player_tag} couldn't be used")
+            if not validate_battle_logs(battle_logs):
+                logger.error("Battle logs for Player %s couldn't be used", player_tag)
                 return
 
             # Prepare the data for storage
-            cleaned_battle_logs = clean_battle_log_list(
+            cleaned_battle_logs, player_name = clean_battle_log_list(
                 battle_logs, player_tag=player_tag
             )
-
-            player_name = get_player_name(battle_logs, player_tag=player_tag)
             extract_game_modes(battle_logs=battle_logs, mode_store=mode_store)
 
             # Insert battles into MongoDB
@@ -169,37 +231,43 @@ async def process_player(
 
         except ClashRoyaleMaintenanceError as e:
             # Global stop, raise error
-            print(
-                f"[WARNING] {getattr(e, 'detail', str(e))} ... Skipping the current cycle"
+            logger.warning(
+                "%s ... Skipping the current cycle", getattr(e, "detail", str(e))
             )
             raise  # Only raise this error
 
         except httpx.HTTPStatusError as e:
             code = e.response.status_code if e.response else 0
             if code in (403, 404):
-                print(f"[ERROR] HTTP {code} for {player_tag} – not retrying")
+                logger.error("HTTP %d for %s – not retrying", code, player_tag)
                 return
             if code in (429, 500, 502, 503, 504) and attempt < settings.MAX_RETRIES:
-                backoff = settings.BASE_BACKOFF * (2**attempt)
-                print(
-                    f"[WARNING] HTTP {code} for {player_tag} – retry in {backoff:.1f}s"
+                # Upon rate limiting, wait exactly as long as the API asks for, if it does
+                retry_after = parse_retry_after(e.response) if code == 429 else None
+                backoff = (
+                    retry_after if retry_after is not None else compute_backoff(attempt)
+                )
+                attempt += 1
+                logger.warning(
+                    "HTTP %d for %s – retry in %.1fs", code, player_tag, backoff
                 )
                 await asyncio.sleep(backoff)
                 continue
-            print(f"[ERROR] HTTP {code} for {player_tag}")
+            logger.error("HTTP %d for %s", code, player_tag)
             return
 
         except httpx.RequestError as e:
             if attempt < settings.MAX_RETRIES:
-                backoff = settings.BASE_BACKOFF * (2**attempt)
-                print(f"[WARN] Net error {e!r} – retry in {backoff:.1f}s")
+                backoff = compute_backoff(attempt)
+                attempt += 1
+                logger.warning("Net error %r – retry in %.1fs", e, backoff)
                 await asyncio.sleep(backoff)
                 continue
-            print(f"[ERROR] Network error for {player_tag}: {e}")
+            logger.error("Network error for %s: %s", player_tag, e)
             return
 
         except Exception as e:
-            print(f"[ERROR] Unknown error for {player_tag}: {e}")
+            logger.error("Unknown error for %s: %s", player_tag, e)
             return
 
 
@@ -234,7 +302,7 @@ async def run_players_cycle(
                     )
                 )
     except* ClashRoyaleMaintenanceError:
-        print("[INFO] Maintenance detected – aborting cycle")
+        logger.info("Maintenance detected – aborting cycle")
 
 
 def extract_game_modes(battle_logs: list[dict], mode_store: UniqueGameModes):
@@ -252,118 +320,227 @@ def extract_game_modes(battle_logs: list[dict], mode_store: UniqueGameModes):
             mode_store.add(game_mode)
 
 
-async def cache_cards(cr_api: ClashRoyaleAPI, redis_conn: RedisConn):
-    """Fetch all card metadata and write it to Redis using 'version-ahead'.
+async def get_tracked_player_tags_cached(
+    mongo_conn: MongoConn, redis_conn: RedisConn
+) -> set[str]:
+    """Load the tracked player tags from the Redis cache, falling back to Mongo.
 
-    The card cache is set with a TTL and marked as one version ahead; after
-    the cycle, a version increment validates these entries. This
-    function does not retry, as on-demand API calls can retrieve cards if
-    this step fails.
+    On a cache miss (or Redis error) the tags are read from Mongo and written back
+    to the cache. The API deletes the cache key whenever a player is (un)tracked,
+    so a cache hit is always up to date. It also bumps a generation counter, the tags
+    are only written back if it didn't change while Mongo was read.
 
     Args:
-        cr_api (ClashRoyaleAPI): API client to fetch the cards.
-        redis_conn (RedisConn): Redis connection used to store the cache.
+        mongo_conn (MongoConn): Mongo connection used on a cache miss.
+        redis_conn (RedisConn): Redis connection holding the cached tag set.
+
+    Returns:
+        set[str]: Tags of the active players.
+
+    Raises:
+        Exception: If the tags couldn't be fetched from Mongo.
     """
 
+    generation = None
     try:
-        # Fetch cards and save them to the redis cache as one version AHEAD
-        cards = await cr_api.get_cards()
-        key = await build_redis_key(
-            conn=redis_conn, service="crApi", resource="allCards", version_ahead=True
-        )
-        await set_redis_json(
-            conn=redis_conn, key=key, value=cards, ttl=2 * settings.CACHE_TTL_CARDS
-        )
-        print(
-            "[CACHE] [INFO] Cards successfully fetched and set in cache with version ahead"
+        tags = await get_redis_set(redis_conn, TRACKED_PLAYER_TAGS_KEY)
+        if tags is not None:
+            return tags
+        # Read before Mongo, an invalidation after this point makes the write below skip
+        generation = await get_redis_generation(
+            redis_conn, TRACKED_PLAYER_TAGS_GENERATION_KEY
         )
     except Exception as e:
-        print(
-            f"[ERROR] Unknown error occurred for while trying to update the cache {e}"
+        logger.warning("[CACHE] Couldn't read the tracked players from cache: %s", e)
+
+    tags = await get_tracked_player_tags(mongo_conn)
+
+    # Without a generation (Redis failed) the tags aren't cached, as they can't be guarded
+    if generation is None:
+        return tags
+
+    try:
+        written = await set_redis_set(
+            redis_conn,
+            TRACKED_PLAYER_TAGS_KEY,
+            tags,
+            ttl=settings.CACHE_TTL_TRACKED_PLAYERS,
+            generation_key=TRACKED_PLAYER_TAGS_GENERATION_KEY,
+            generation=generation,
         )
+        if not written:
+            logger.info(
+                "[CACHE] Tracked players changed while loading, not caching them"
+            )
+    except Exception as e:
+        logger.warning("[CACHE] Couldn't cache the tracked players: %s", e)
+
+    return tags
+
+
+async def fetch_cards(cr_api: ClashRoyaleAPI):
+    """Fetch all card metadata for the 'version-ahead' card cache.
+
+    This function does not retry, as on-demand API calls can retrieve cards if
+    this step fails.
+
+    Args:
+        cr_api (ClashRoyaleAPI): API client to fetch the cards.
+
+    Returns:
+        list | None: All cards in the game, or None if fetching failed.
+    """
+
+    try:
+        return await cr_api.get_cards()
+    except Exception as e:
+        logger.error("Unknown error occurred while trying to fetch the cards %s", e)
+        return None
+
+
+async def cache_cards_and_increment_version(redis_conn: RedisConn, cards):
+    """Write the cards to Redis as one version ahead and increment the version.
+
+    The card cache is set with a TTL and marked as one version ahead; the version
+    increment in the same MULTI/EXEC transaction validates it and invalidates the
+    current version keys. Without cards, only the version is incremented.
+
+    Args:
+        redis_conn (RedisConn): Redis connection used to store the cache.
+        cards (list | None): Card metadata fetched in this cycle.
+
+    Returns:
+        int: The new version number.
+    """
+
+    if cards is not None:
+        try:
+            key = await build_redis_key(
+                conn=redis_conn,
+                service="crApi",
+                resource="allCards",
+                version_ahead=True,
+            )
+            new_version = await redis_conn.set_json_and_increment_version(
+                key=key, value=cards, ttl=2 * settings.CACHE_TTL_CARDS
+            )
+            logger.info("[CACHE] Cards successfully set in cache with version ahead")
+            return new_version
+        except Exception as e:
+            logger.error(
+                "Unknown error occurred while trying to update the cache %s", e
+            )
+
+    return await redis_conn.increment_version()
 
 
 async def main():
     """Start and run the continuous scraping loop.
 
-    - Waits for dependent services to be ready (`INIT_SLEEP_DURATION`).
-    - Initializes API, Redis, and Mongo connections.
+    - Initializes API, Redis, and Mongo connections, probing each service until it
+      responds (no fixed boot sleep, the loop starts as soon as all are ready).
     - Every cycle:
-        * Loads tracked player tags from Mongo.
-        * Runs a concurrent player processing cycle (rate-limited fetch).
+        * Loads tracked player tags from the Redis cache, or from Mongo on a miss.
+        * Runs a concurrent player processing cycle (rate-limited fetch) and,
+          overlapping with it, fetches the card metadata.
         * Saves newly found game modes to Mongo.
-        * Refreshes the card cache (version-ahead), then increments the Redis version
-          to invalidate old keys and validate the new ones.
+        * Writes the card cache (version-ahead) and increments the Redis version in one
+          transaction to invalidate old keys and validate the new ones.
         * Sleeps `REQUEST_CYCLE_DURATION` before the next cycle.
     """
 
     cr_api, redis_conn, mongo_conn = await init()
 
+    # Last successfully loaded tags, reused if the lookup fails in a cycle
+    players = set()
+
     while True:
-        print("[INFO] Starting new data scraping cycle...")
+        logger.info("Starting new data scraping cycle...")
 
         start_time = time.time()
 
         # TODO upon hitting "Player doesn't exist" remove from tracked players, as player deleted their account?
 
         # Loop over every tracked player
-        players = set()
+        # Tags are loaded once per cycle, as players can be (un)tracked via the API at any time
         try:
-            players = await get_tracked_player_tags(mongo_conn)
-            print(f"[INFO] Found {len(players)} tracked players: {players}")
+            players = await get_tracked_player_tags_cached(mongo_conn, redis_conn)
+            logger.info("Found %d tracked players", len(players))
+            # Dumping every tag is only worth it when debugging
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Tracked players: %s", sorted(players))
         except Exception:
-            continue
+            # Don't spin on a failing lookup, keep tracking the previously loaded players
+            logger.warning(
+                "Couldn't load tracked players, reusing %d from last cycle",
+                len(players),
+            )
 
         if not players:
-            print("[WARNING] No players to track, sleeping until next cycle")
+            logger.warning("No players to track, sleeping until next cycle")
             await asyncio.sleep(settings.REQUEST_CYCLE_DURATION)
             continue
 
         mode_store = UniqueGameModes()
 
         # Run fetching, cleaning and storing of data concurrently
-        await run_players_cycle(
-            players=players, mode_store=mode_store, cr_api=cr_api, mongo_conn=mongo_conn
+        # Card fetching is independent of the player data, so overlap it with the cycle
+        players_task = asyncio.create_task(
+            run_players_cycle(
+                players=players,
+                mode_store=mode_store,
+                cr_api=cr_api,
+                mongo_conn=mongo_conn,
+            )
         )
+        cards_task = asyncio.create_task(fetch_cards(cr_api=cr_api))
+        _, cards = await asyncio.gather(players_task, cards_task)
 
         # Get a list of all unique game modes in this iteration of battle logs
         game_modes = mode_store.get_values()
         modes_result = await insert_game_modes(mongo_conn, game_modes)
-        print(
-            f"[INFO] {modes_result.get('inserted')} game modes inserted, "
-            f"{modes_result.get('modified')} modified"
+        logger.info(
+            "%s game modes inserted, %s modified",
+            modes_result.get("inserted"),
+            modes_result.get("modified"),
         )
 
-        # Optional debug (uncomment to check first documents and document count)
+        # One document count per cycle, never per player
         battles_count = await get_battles_count(mongo_conn)
-        print(f"[INFO] There are now {battles_count} battles in the collection")
-        # await print_first_battles(mongo_conn)
-
-        # Save new cards as the version ahead
-        await cache_cards(cr_api=cr_api, redis_conn=redis_conn)
-        # Increment redis key version, invalidate cache
-        new_version = await redis_conn.increment_version()
+        logger.info("There are now %d battles in the collection", battles_count)
+        # Optional debug (enable in settings to check the first documents)
+        if settings.DEBUG_PRINT_FIRST_BATTLES:
+            await print_first_battles(mongo_conn)
+
+        # Save new cards as the version ahead and increment redis key version, invalidate cache
+        new_version = await cache_cards_and_increment_version(
+            redis_conn=redis_conn, cards=cards
+        )
         # Existing current version keys will be invalid; not looked up anymore, and be deleted via expiring ttl
         # All cards key, that was one version ahead, will be validated with this increment
-        print(
-            f"[CACHE] [INFO] Redis version incremented to v{new_version}, cache invalidated."
+        logger.info(
+            "[CACHE] Redis version incremented to v%d, cache invalidated.", new_version
         )
 
         # Determine how long to sleep for to meet aimed at cycle time
         end_time = time.time()
         elapsed_time = end_time - start_time
         sleep_time = settings.REQUEST_CYCLE_DURATION - elapsed_time
-        print(f"[INFO] Cycle took {elapsed_time:.2f}s for {len(players)} players")
+        logger.info("Cycle took %.2fs for %d players", elapsed_time, len(players))
 
         # Check if valid sleep time remains
         if sleep_time <= 0:
-            print("[WARNING] Cycle duration is too low. Running without sleep")
+            logger.warning("Cycle duration is too low. Running without sleep")
             sleep_time = 0  # Don't sleep at all
 
         await asyncio.sleep(sleep_time)
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    log_listener = setup_logging(settings.LOG_LEVEL)
+    try:
+        asyncio.run(main())
+    finally:
+        log_listener.stop()  # flush queued records
 
 # TODO add unit testing with example data
@@ -1,9 +1,13 @@
 from dotenv import load_dotenv, find_dotenv
+from dataclasses import dataclass
 import os
 
 load_dotenv(find_dotenv())
 
 
+# Frozen + slots: every setting is declared once, read-only at runtime and
+# resolved via a slot descriptor instead of the instance __dict__
+@dataclass(frozen=True, slots=True)
 class Settings:
     """Application settings and configuration."""
 
@@ -15,9 +19,14 @@ class Settings:
     REDIS_HOST: str = "redis"
     REDIS_PORT: int = 6379
 
+    # Logging Configuration
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+
     # Application Configuration
-    INIT_RETRIES: int = 3
-    INIT_RETRY_DELAY: float = 3
+    # Services are actively probed on boot instead of waiting a fixed time,
+    # so keep the delay short and allow more attempts for slow container starts
+    INIT_RETRIES: int = 20
+    INIT_RETRY_DELAY: float = 1.0
 
     # Sleep time between the scraping cycles
     REQUEST_CYCLE_DURATION: float = 5 * 60  # 5 minutes
@@ -28,12 +37,17 @@ class Settings:
     # Upon unsuccessful API call
     MAX_RETRIES: int = 5
     BASE_BACKOFF: float = 1.0  # seconds
+    MAX_BACKOFF: float = 60.0  # seconds, cap for the jittered exponential backoff
 
     # MongoDB Configuration
     MONGO_CLIENT_NAME: str = "cr-analytics-data-scraper"
+    # Preview the first battle documents after every cycle (extra query, debug only)
+    DEBUG_PRINT_FIRST_BATTLES: bool = False
 
     # Cache TTL (Time To Live) in seconds
     CACHE_TTL_CARDS: int = 6 * 60 * 60  # 6 hours
+    # Invalidated by the API whenever a player is (un)tracked, TTL is only a fallback
+    CACHE_TTL_TRACKED_PLAYERS: int = 10 * 60  # 10 minutes
 
 
 # Global settings instance
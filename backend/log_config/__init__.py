@@ -0,0 +1,5 @@
+from .queue_logging import setup_logging
+
+__all__ = [
+    "setup_logging",
+]
@@ -0,0 +1,33 @@
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
+
+def setup_logging(level: str = "INFO") -> QueueListener:
+    """
+    Configure the root logger to hand records off to a background thread.
+
+    Log calls only put the record into a queue, formatting and writing to stdout
+    happens in a QueueListener thread, so the event loop never blocks on output.
+
+    Args:
+        level (str): Minimum level of records that get logged (default: INFO)
+
+    Returns:
+        QueueListener: The started listener, stop it on shutdown to flush remaining records.
+    """
+
+    log_queue = queue.SimpleQueue()
+
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(
+        logging.Formatter("%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+    )
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.handlers = [QueueHandler(log_queue)]
+
+    listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    listener.start()
+    return listener
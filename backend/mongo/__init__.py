@@ -3,11 +3,16 @@ from .battles_read import (
     get_battles_count,
     print_first_battles,
     get_last_battles,
-    get_decks_win_percentage,
-    get_cards_win_percentage,
+    get_decks_and_cards_win_percentage,
     get_daily_stats,
+    get_player_first_battle,
+)
+from .battles_write import (
+    insert_battles,
+    ensure_battle_indexes,
+    ensure_player_summaries,
+    backfill_reference_player_decks,
 )
-from .battles_write import insert_battles
 
 from .players_read import (
     get_tracked_player_tags,
@@ -19,10 +24,12 @@ from .players_write import (
     insert_tracked_player,
     set_player_name,
     deactivate_tracked_player,
+    ensure_player_indexes,
 )
 
 from .game_modes_write import insert_game_modes
 from .game_modes_read import get_game_modes
+from .query_utils import STATS_RESULT_LIMIT
 
 __all__ = [
     "MongoConn",
@@ -31,11 +38,14 @@ __all__ = [
     "get_battles_count",
     "print_first_battles",
     "get_last_battles",
-    "get_decks_win_percentage",
-    "get_cards_win_percentage",
+    "get_decks_and_cards_win_percentage",
     "get_daily_stats",
+    "get_player_first_battle",
     ## write
     "insert_battles",
+    "ensure_battle_indexes",
+    "ensure_player_summaries",
+    "backfill_reference_player_decks",
     # players
     ## read
     "get_tracked_player_tags",
@@ -46,9 +56,12 @@ __all__ = [
     "insert_tracked_player",
     "set_player_name",
     "deactivate_tracked_player",
+    "ensure_player_indexes",
     # game_modes
     ## read
     "get_game_modes",
     ## write
     "insert_game_modes",
+    # query utils
+    "STATS_RESULT_LIMIT",
 ]
@@ -1,18 +1,139 @@
+import logging
 from .connection import MongoConn
 from .validation_utils import ensure_connected, check_valid_date_range
 from .query_utils import (
     match_tag_before_datetime_stage,
     match_tag_date_mode_range_stage,
     extract_deck_cards_stage,
+    DECK_FIELDS_STAGE,
+    DECK_GROUP_STAGE,
+    DECK_STATS_STAGES,
+    CARD_STATS_STAGES,
+    range_index_hint,
+    TAG_TIME_INDEX,
+    WIN_FLAG,
 )
 from datetime import datetime, date
 from typing import Optional, Iterable
+import asyncio
+import time
+
+logger = logging.getLogger(__name__)
+
+# Pipeline ordering contract for the aggregations in this module:
+# the $match on referencePlayerTag/battleTime always comes first, followed by any
+# $sort/$limit that prunes documents, and only then $addFields/$project/$unwind.
+# A reshaping stage in between keeps MongoDB from pushing the match (and a top-k
+# sort) into the (referencePlayerTag, battleTime) index scan.
+
+# The read aggregations are bounded by the index scan of a single player's range,
+# a spill to disk would point at a regression, so it fails fast instead
+ALLOW_DISK_USE = False
+
+# Fields of a battle the frontend renders, card names are resolved client-side by id
+BATTLE_DISPLAY_PROJECTION = {
+    "_id": 0,
+    "battleTime": 1,
+    "gameResult": 1,
+    "gameMode": 1,
+    "arena": 1,
+    "team.tag": 1,
+    "team.name": 1,
+    "team.crowns": 1,
+    "team.elixirLeaked": 1,
+    "team.cards.id": 1,
+    "team.cards.level": 1,
+    "team.cards.evolutionLevel": 1,
+    "opponent.tag": 1,
+    "opponent.name": 1,
+    "opponent.crowns": 1,
+    "opponent.elixirLeaked": 1,
+    "opponent.cards.id": 1,
+    "opponent.cards.level": 1,
+    "opponent.cards.evolutionLevel": 1,
+}
+
+# Fields of a battle shown in the debug preview, the team/opponent arrays are left out
+BATTLE_PREVIEW_PROJECTION = {
+    "_id": 0,
+    "referencePlayerTag": 1,
+    "battleTime": 1,
+    "gameResult": 1,
+    "gameMode": 1,
+}
+
+# Per-battle fields of the daily stats, independent of the request, so built once
+DAILY_BATTLE_FIELDS = {
+    # crowns per side: take MAX across players (avoids 2v2 double-count),
+    # $max skips missing crowns and is null for a missing or empty side
+    "crownsForSafe": {"$ifNull": [{"$max": "$team.crowns"}, 0]},
+    "crownsAgainstSafe": {"$ifNull": [{"$max": "$opponent.crowns"}, 0]},
+    "isWin": WIN_FLAG,
+    "isLoss": {"$cond": [{"$eq": ["$gameResult", "Defeat"]}, 1, 0]},
+    "isDraw": {"$cond": [{"$eq": ["$gameResult", "Draw"]}, 1, 0]},
+    # Stored as a float by the scraper, older documents convert the reference player's value
+    "elixirLeakedSafe": {
+        "$ifNull": [
+            "$referencePlayerElixirLeaked",
+            {
+                "$convert": {
+                    "input": {
+                        "$getField": {
+                            "field": "elixirLeaked",
+                            "input": {
+                                "$first": {
+                                    "$filter": {
+                                        "input": {"$ifNull": ["$team", []]},
+                                        "as": "t",
+                                        "cond": {
+                                            "$eq": ["$$t.tag", "$referencePlayerTag"]
+                                        },
+                                    }
+                                }
+                            },
+                        }
+                    },
+                    "to": "double",
+                    "onError": 0,
+                    "onNull": 0,
+                }
+            },
+        ]
+    },
+}
+
+# Daily stats group of the battles per local day
+DAILY_GROUP_STAGE = {
+    "$group": {
+        "_id": "$day",
+        "battles": {"$sum": 1},
+        "victories": {"$sum": "$isWin"},
+        "defeats": {"$sum": "$isLoss"},
+        "draws": {"$sum": "$isDraw"},
+        "crownsFor": {"$sum": "$crownsForSafe"},
+        "crownsAgainst": {"$sum": "$crownsAgainstSafe"},
+        "elixirLeaked": {"$sum": "$elixirLeakedSafe"},
+    }
+}
+
+# Upper bound of days fetched per cursor batch of the daily stats
+DAILY_BATCH_SIZE = 500
+
+# Seconds a fetched battle count is reused in-process before querying again
+BATTLES_COUNT_TTL = 30.0
+
+# One-slot cache for the battle count: value and its monotonic expiry timestamp
+_battles_count_cache = {"value": None, "expires_at": 0.0}
+_battles_count_lock = asyncio.Lock()
 
 
 async def get_battles_count(conn: MongoConn):
     """
     Gets the total count of documents in the battles collection.
 
+    The count is cached in-process for `BATTLES_COUNT_TTL` seconds, concurrent
+    callers on an expired cache share a single query.
+
     Args:
         conn (MongoConn): Active connection to the mongo database
 
@@ -23,13 +144,24 @@ async def get_battles_count(conn: MongoConn):
         Exception: If query fails
     """
 
-    try:
-        await ensure_connected(conn)
-        count = await conn.db.battles.count_documents({})
+    if time.monotonic() < _battles_count_cache["expires_at"]:
+        return _battles_count_cache["value"]
+
+    async with _battles_count_lock:
+        # Another caller might have refreshed the count while waiting for the lock
+        if time.monotonic() < _battles_count_cache["expires_at"]:
+            return _battles_count_cache["value"]
+
+        try:
+            await ensure_connected(conn)
+            count = await conn.db.battles.estimated_document_count()
+        except Exception as e:
+            logger.error("fetching document count: %s", e)
+            raise
+
+        _battles_count_cache["value"] = count
+        _battles_count_cache["expires_at"] = time.monotonic() + BATTLES_COUNT_TTL
         return count
-    except Exception as e:
-        print(f"[DB] [ERROR] fetching document count: {e}")
-        raise
 
 
 async def print_first_battles(conn: MongoConn, limit: int = 5):
@@ -44,11 +176,13 @@ async def print_first_battles(conn: MongoConn, limit: int = 5):
     try:
         await ensure_connected(conn)
         # Preview first few documents
-        async for doc in conn.db.battles.find().limit(limit):
-            print(doc)
+        cursor = conn.db.battles.find({}, BATTLE_PREVIEW_PROJECTION)
+        docs = await cursor.limit(limit).batch_size(limit).to_list(length=limit)
+        for doc in docs:
+            logger.info("%s", doc)
 
     except Exception as e:
-        print(f"[DB] [ERROR] fetching collection info: {e}")
+        logger.error("fetching collection info: %s", e)
 
 
 async def get_last_battles(
@@ -79,199 +213,118 @@ async def get_last_battles(
         if not isinstance(before_datetime, datetime):
             raise TypeError("end_datetime must be a datetime")
 
-        pipeline = [
-            match_tag_before_datetime_stage(player_tag, before_datetime),
-            # Last N matches before specified battleTime
-            {"$sort": {"battleTime": -1}},
-            {"$limit": limit},
-            {
-                "$facet": {
-                    "battles": [
-                        {
-                            "$project": {
-                                "_id": 0,
-                                "battleTime": 1,
-                                "gameResult": 1,
-                                "gameMode": 1,
-                                "team": 1,
-                                "opponent": 1,
-                                "arena": 1,
-                            }
-                        }
-                    ],
-                    "meta": [
-                        {
-                            "$group": {
-                                "_id": None,
-                                "latest": {"$max": "$battleTime"},
-                                "earliest": {"$min": "$battleTime"},
-                            }
-                        }
-                    ],
-                }
-            },
-            {
-                "$project": {
-                    "battles": 1,
-                    "latestBattleTime": {
-                        "$ifNull": [{"$arrayElemAt": ["$meta.latest", 0]}, None]
-                    },
-                    "earliestBattleTime": {
-                        "$ifNull": [{"$arrayElemAt": ["$meta.earliest", 0]}, None]
-                    },
-                }
-            },
-        ]
-
-        res = await conn.db.battles.aggregate(pipeline, allowDiskUse=True).to_list(
-            length=1
+        # Last N matches before specified battleTime, served by the
+        # (referencePlayerTag, battleTime) index and shipped in a single batch
+        cursor = (
+            conn.db.battles.find(
+                match_tag_before_datetime_stage(player_tag, before_datetime)["$match"],
+                BATTLE_DISPLAY_PROJECTION,
+            )
+            .sort("battleTime", -1)
+            # Pin the index, so the planner can't fall back to an in-memory sort
+            .hint(TAG_TIME_INDEX)
+            .limit(limit)
+            .batch_size(limit)
         )
+        battles = await cursor.to_list(length=limit)
 
-        if not res:
-            return {"battles": [], "latestBattleTime": None, "earliestBattleTime": None}
-        return res[0]
+        # Battles are sorted newest first, so the time range comes from both ends
+        return {
+            "battles": battles,
+            "latestBattleTime": battles[0]["battleTime"] if battles else None,
+            "earliestBattleTime": battles[-1]["battleTime"] if battles else None,
+        }
 
     except Exception as e:
-        print(f"[DB] [ERROR] fetching decks info: {e}")
+        logger.error("fetching decks info: %s", e)
         raise
 
 
-async def get_decks_win_percentage(
-    conn: MongoConn,
-    player_tag: str,
-    start_date: date,
-    end_date: date,
-    game_modes: Optional[Iterable[str]] = None,
-    timezone: str = "UTC",
-):
+async def aggregate_single_document(conn: MongoConn, pipeline: list):
     """
-    Fetches every unique deck that the player has played in the given time frame.
+    Runs a battles aggregation that produces at most one document and returns it.
+
+    The cursor asks for a batch size of one, so the initial reply already carries
+    the document, no further batch is requested and the cursor is closed right away.
+    The aggregation is pinned to the index serving its leading range match.
 
     Args:
         conn (MongoConn): Active connection to the MongoDB database.
-        player_tag (str): The tag of the player whose unique decks are to be fetched.
-        start_date (date): Date after which the game happened.
-        end_date (date): Date before which the game happened.
-        game_modes (Optional[Iterable[str]]): If provided/non-empty, filter to these game modes in which the game happened.
-        timezone: Timezone into which the battle datetimes will be converted (default: UTC)
+        pipeline (list): Aggregation pipeline yielding a single document, e.g. ending in a `$facet`,
+            starting with a `match_tag_date_mode_range_stage`.
 
     Returns:
-        list: A list of dictionaries containing the players unique decks and their win-rates
-    Raises:
-        Exception: If there is an error while fetching the battles from the database.
+        dict | None: The resulting document, None if the pipeline yielded nothing
     """
 
-    try:
-        await ensure_connected(conn)
-        check_valid_date_range(start_date, end_date)
+    async with conn.aggregation_slots:
+        cursor = conn.db.battles.aggregate(
+            pipeline,
+            allowDiskUse=ALLOW_DISK_USE,
+            batchSize=1,
+            hint=range_index_hint(pipeline[0]),
+        )
+        try:
+            async for doc in cursor:
+                return doc
+            return None
+        finally:
+            await cursor.close()
 
-        pipeline = [
-            # Match the relevant files for the player and the time frame
-            match_tag_date_mode_range_stage(
-                player_tag, start_date, end_date, game_modes, timezone
-            ),
-            extract_deck_cards_stage(player_tag),
-            # Remove level field from deck cards
-            {
-                "$addFields": {
-                    "deckCardsNormalized": {
-                        "$map": {
-                            "input": "$deckCards",
-                            "as": "card",
-                            "in": {
-                                "id": "$$card.id",
-                                "name": "$$card.name",
-                                "evolutionLevel": "$$card.evolutionLevel",
-                            },
-                        }
-                    }
-                }
-            },
-            # Sort the decks by card properties - evolution level first, then id
-            {
-                "$addFields": {
-                    "deckSorted": {
-                        "$sortArray": {
-                            "input": "$deckCardsNormalized",
-                            "sortBy": {"evolutionLevel": -1, "id": 1},
-                        }
-                    }
-                }
-            },
-            # Group by decks and get metadata
-            {
-                "$facet": {
-                    "decks": [
-                        {
-                            "$group": {
-                                "_id": "$deckSorted",
-                                "count": {"$sum": 1},
-                                "wins": {
-                                    "$sum": {
-                                        "$cond": [
-                                            {"$eq": ["$gameResult", "Victory"]},
-                                            1,
-                                            0,
-                                        ]
-                                    }
-                                },
-                                "firstSeen": {"$min": "$battleTime"},
-                                "lastSeen": {"$max": "$battleTime"},
-                                "modes": {"$addToSet": "$gameMode"},
-                            }
-                        },
-                        # Calculate a win rate and evolution metrics for the end result
-                        {
-                            "$project": {
-                                "_id": 0,
-                                "deck": "$_id",  # array of {id, name} for every card
-                                "count": 1,
-                                "wins": 1,
-                                "winRate": {
-                                    "$cond": [
-                                        {"$eq": ["$count", 0]},
-                                        0,
-                                        {
-                                            "$multiply": [
-                                                {"$divide": ["$wins", "$count"]},
-                                                100,
-                                            ]
-                                        },
-                                    ]
-                                },
-                                "firstSeen": 1,
-                                "lastSeen": 1,
-                                "modes": 1,
-                            }
-                        },
-                        # Sort unique decks by count (descending) and lastSeen
-                        {"$sort": {"count": -1, "lastSeen": -1}},
-                    ],
-                    "meta": [{"$count": "totalBattles"}],
-                }
-            },
-            {
-                "$project": {
-                    "totalBattles": {"$ifNull": [{"$first": "$meta.totalBattles"}, 0]},
-                    "decks": "$decks",
-                }
-            },
-        ]
 
-        result = await conn.db.battles.aggregate(pipeline, allowDiskUse=True).to_list(
-            length=1
-        )
-        if not result:
-            return {"decks": [], "totalBattles": 0}
+async def has_battles_in_range(conn: MongoConn, match_stage: dict) -> bool:
+    """
+    Checks the player's summary for whether battles can fall into a date range match.
+
+    Players without a summary (e.g. not built yet) are assumed to have battles,
+    so only ranges outside the player's known battle time span are ruled out.
+
+    Args:
+        conn (MongoConn): Active connection to the MongoDB database.
+        match_stage (dict): Stage built by `match_tag_date_mode_range_stage`.
+
+    Returns:
+        bool: False if the player certainly has no battles in the range, True otherwise
+    """
+
+    match = match_stage["$match"]
+    summary = await conn.db.player_summary.find_one(
+        {"_id": match["referencePlayerTag"]}
+    )
+    if summary is None:
+        return True
+
+    # Stored datetimes are naive UTC
+    start = match["battleTime"]["$gte"].replace(tzinfo=None)
+    end = match["battleTime"]["$lt"].replace(tzinfo=None)
+    return summary["firstBattle"] < end and summary["lastBattle"] >= start
+
+
+async def get_player_first_battle(conn: MongoConn, player_tag: str) -> datetime | None:
+    """
+    Fetches the time of the player's first stored battle from their summary.
+
+    Args:
+        conn (MongoConn): Active connection to the MongoDB database.
+        player_tag (str): The tag of the player.
+
+    Returns:
+        datetime | None: The naive UTC battle time, None if no battle of the player is stored yet
+    """
 
-        return result[0]
+    try:
+        await ensure_connected(conn)
+        summary = await conn.db.player_summary.find_one(
+            {"_id": player_tag}, {"_id": 0, "firstBattle": 1}
+        )
+        return summary.get("firstBattle") if summary else None
 
     except Exception as e:
-        print(f"[DB] [ERROR] fetching decks info: {e}")
+        logger.error("fetching the first battle of player %s: %s", player_tag, e)
         raise
 
 
-async def get_cards_win_percentage(
+async def get_decks_and_cards_win_percentage(
     conn: MongoConn,
     player_tag: str,
     start_date: date,
@@ -280,18 +333,27 @@ async def get_cards_win_percentage(
     timezone: str = "UTC",
 ):
     """
-    Fetches a usage and win percentage for every used card for the player in the specified time range.
+    Fetches the deck and the card statistics of the player in one aggregation.
+
+    The battles are matched, their deck cards extracted and grouped into unique
+    decks once, both statistics are then computed from the same grouped decks.
+    Both are capped to `STATS_RESULT_LIMIT` entries, the total battles count every
+    matched battle.
 
     Args:
         conn (MongoConn): Active connection to the MongoDB database.
-        player_tag (date): The tag of the player whose unique decks are to be fetched.
+        player_tag (str): The tag of the player whose statistics are to be fetched.
         start_date (date): Date after which the game happened.
         end_date (date): Date before which the game happened.
         game_modes (Optional[Iterable[str]]): If provided/non-empty, filter to these game modes in which the game happened.
         timezone: Timezone into which the battle datetimes will be converted (default: UTC)
 
     Returns:
-        list: A list of dictionaries containing the card win-rate and usages
+        dict: Containing
+            - decks (dict): `decks`, the unique decks as `{deck, count, wins, winRate, firstSeen,
+              lastSeen, modes}` sorted by count (descending) and lastSeen, and `totalBattles`
+            - cards (dict): `cards`, the usages per card as `{card, usage, wins, winRate}`
+              sorted by usage (descending), and `totalBattles`
     Raises:
         Exception: If there is an error while fetching the battles from the database.
     """
@@ -300,77 +362,45 @@ async def get_cards_win_percentage(
         await ensure_connected(conn)
         check_valid_date_range(start_date, end_date)
 
+        match_stage = match_tag_date_mode_range_stage(
+            player_tag, start_date, end_date, game_modes, timezone
+        )
+        if not await has_battles_in_range(conn, match_stage):
+            return {
+                "decks": {"decks": [], "totalBattles": 0},
+                "cards": {"cards": [], "totalBattles": 0},
+            }
+
         pipeline = [
-            match_tag_date_mode_range_stage(
-                player_tag, start_date, end_date, game_modes, timezone
-            ),
+            match_stage,
+            DECK_FIELDS_STAGE,
             extract_deck_cards_stage(player_tag),
+            # Both statistics are derived from the unique decks
+            DECK_GROUP_STAGE,
             {
                 "$facet": {
-                    "cards": [
-                        {"$unwind": "$deckCards"},
-                        {
-                            "$group": {
-                                "_id": {
-                                    "id": "$deckCards.id",
-                                    "name": "$deckCards.name",
-                                    "evolutionLevel": "$deckCards.evolutionLevel",
-                                },
-                                "usage": {"$sum": 1},  # Usage in battle
-                                "wins": {
-                                    "$sum": {
-                                        "$cond": [
-                                            {"$eq": ["$gameResult", "Victory"]},
-                                            1,
-                                            0,
-                                        ]
-                                    }
-                                },
-                            }
-                        },
-                        {
-                            "$project": {
-                                "_id": 0,
-                                "card": "$_id",
-                                "usage": 1,
-                                "wins": 1,
-                                "winRate": {
-                                    "$cond": [
-                                        {"$eq": ["$usage", 0]},
-                                        0,
-                                        {
-                                            "$multiply": [
-                                                {"$divide": ["$wins", "$usage"]},
-                                                100,
-                                            ]
-                                        },
-                                    ]
-                                },
-                            }
-                        },
-                        {"$sort": {"usage": -1}},
-                    ],
-                    "meta": [{"$count": "totalBattles"}],
+                    "decks": DECK_STATS_STAGES,
+                    "cards": CARD_STATS_STAGES,
+                    # Every battle is counted for one deck, summed before the cap
+                    "total": [{"$group": {"_id": None, "battles": {"$sum": "$count"}}}],
                 }
             },
-            {
-                "$set": {
-                    "totalBattles": {"$ifNull": [{"$first": "$meta.totalBattles"}, 0]}
-                }
-            },
-            {"$project": {"totalBattles": 1, "cards": "$cards"}},
         ]
 
-        res = await conn.db.battles.aggregate(pipeline, allowDiskUse=True).to_list(
-            length=1
-        )
-        if not res:
-            return {"cards": [], "totalBattles": 0}
+        result = await aggregate_single_document(conn, pipeline) or {
+            "decks": [],
+            "cards": [],
+            "total": [],
+        }
 
-        return res[0]
+        total_battles = result["total"][0]["battles"] if result["total"] else 0
+        return {
+            "decks": {"decks": result["decks"], "totalBattles": total_battles},
+            "cards": {"cards": result["cards"], "totalBattles": total_battles},
+        }
 
     except Exception as e:
-        print(f"[DB] [ERROR] fetching card stats: {e}")
+        logger.error("fetching deck and card stats: %s", e)
         raise
 
 
@@ -407,126 +437,37 @@ async def get_daily_stats(
         await ensure_connected(conn)
         check_valid_date_range(start_date, end_date)
 
+        # Convert local [start,end] to UTC bounds & apply mode filter
+        match_stage = match_tag_date_mode_range_stage(
+            player_tag, start_date, end_date, game_modes, timezone=timezone
+        )
+        if not await has_battles_in_range(conn, match_stage):
+            return {"daily": [], "totalBattles": 0}
+
+        # Dates are in UTC without a timezone, so the default skips the per-battle conversion
+        tz_arg = {} if timezone == "UTC" else {"timezone": timezone}
+
         pipeline = [
-            # Convert local [start,end] to UTC bounds & apply mode filter
-            match_tag_date_mode_range_stage(
-                player_tag, start_date, end_date, game_modes, timezone=timezone
-            ),
-            #  derive local day, normalize tags, crowns, flags
+            match_stage,
+            #  derive local day, crowns, flags
             {
                 "$addFields": {
                     "day": {
-                        "$dateTrunc": {
-                            "date": "$battleTime",
-                            "unit": "day",
-                            "timezone": timezone,
-                        }
-                    },
-                    # extract team tags
-                    "teamTags": {
-                        "$map": {
-                            "input": {"$ifNull": ["$team", []]},
-                            "as": "t",
-                            "in": "$$t.tag",
-                        }
-                    },
-                    # crowns per side: take MAX across players (avoids 2v2 double-count)
-                    "crownsForSafe": {
-                        "$reduce": {
-                            "input": {
-                                "$map": {
-                                    "input": {"$ifNull": ["$team", []]},
-                                    "as": "t",
-                                    "in": {"$ifNull": ["$$t.crowns", 0]},
-                                }
-                            },
-                            "initialValue": 0,
-                            "in": {
-                                "$cond": [
-                                    {"$gt": ["$$this", "$$value"]},
-                                    "$$this",
-                                    "$$value",
-                                ]
-                            },
-                        }
-                    },
-                    "crownsAgainstSafe": {
-                        "$reduce": {
-                            "input": {
-                                "$map": {
-                                    "input": {"$ifNull": ["$opponent", []]},
-                                    "as": "o",
-                                    "in": {"$ifNull": ["$$o.crowns", 0]},
-                                }
-                            },
-                            "initialValue": 0,
-                            "in": {
-                                "$cond": [
-                                    {"$gt": ["$$this", "$$value"]},
-                                    "$$this",
-                                    "$$value",
-                                ]
-                            },
-                        }
+                        "$dateTrunc": {**tz_arg, "date": "$battleTime", "unit": "day"}
                     },
-                    "isWin": {"$cond": [{"$eq": ["$gameResult", "Victory"]}, 1, 0]},
-                    "isLoss": {"$cond": [{"$eq": ["$gameResult", "Defeat"]}, 1, 0]},
-                    "isDraw": {"$cond": [{"$eq": ["$gameResult", "Draw"]}, 1, 0]},
-                }
-            },
-            #  Stage B: compute index of reference player (now fields exist)
-            {
-                "$addFields": {
-                    "refIdx": {"$indexOfArray": ["$teamTags", "$referencePlayerTag"]}
-                }
-            },
-            #  Stage C: extract 'player' safely using refIdx
-            {
-                "$addFields": {
-                    "me": {
-                        "$cond": [
-                            {"$gte": ["$refIdx", 0]},
-                            {"$arrayElemAt": [{"$ifNull": ["$team", []]}, "$refIdx"]},
-                            None,
-                        ]
-                    }
-                }
-            },
-            #  Stage D: cast leaked elixir (no $exists inside agg expr)
-            {
-                "$addFields": {
-                    "elixirLeakedSafe": {
-                        "$convert": {
-                            "input": "$me.elixirLeaked",
-                            "to": "double",
-                            "onError": 0,
-                            "onNull": 0,
-                        }
-                    }
-                }
-            },
-            #  Group per local day
-            {
-                "$group": {
-                    "_id": "$day",
-                    "battles": {"$sum": 1},
-                    "victories": {"$sum": "$isWin"},
-                    "defeats": {"$sum": "$isLoss"},
-                    "draws": {"$sum": "$isDraw"},
-                    "crownsFor": {"$sum": "$crownsForSafe"},
-                    "crownsAgainst": {"$sum": "$crownsAgainstSafe"},
-                    "elixirLeaked": {"$sum": "$elixirLeakedSafe"},
+                    **DAILY_BATTLE_FIELDS,
                 }
             },
+            DAILY_GROUP_STAGE,
             #  Shape output & winRate
             {
                 "$project": {
                     "_id": 0,
                     "date": {
                         "$dateToString": {
+                            **tz_arg,
                             "format": "%Y-%m-%d",
                             "date": "$_id",
-                            "timezone": timezone,
                         }
                     },
                     "battles": 1,
@@ -558,14 +499,24 @@ async def get_daily_stats(
             {"$sort": {"date": 1}},
         ]
 
-        result = await conn.db.battles.aggregate(pipeline, allowDiskUse=True).to_list(
-            length=None
-        )
-        return {
-            "daily": result,
-            "totalBattles": sum(day["battles"] for day in result),
-        }
+        # At most one entry per day of the (inclusive) range
+        max_days = (end_date - start_date).days + 1
+        daily = []
+        total_battles = 0
+        # Stream the days in bounded batches, the total is summed along the way
+        # instead of running a second count over the same battles
+        async with conn.aggregation_slots:
+            cursor = conn.db.battles.aggregate(
+                pipeline,
+                allowDiskUse=ALLOW_DISK_USE,
+                batchSize=min(max_days, DAILY_BATCH_SIZE),
+                hint=range_index_hint(match_stage),
+            )
+            async for day in cursor:
+                total_battles += day["battles"]
+                daily.append(day)
+        return {"daily": daily, "totalBattles": total_battles}
 
     except Exception as e:
-        print(f"[DB] [ERROR] fetching daily stats: {e}")
+        logger.error("fetching daily stats: %s", e)
         raise
@@ -1,6 +1,26 @@
+import logging
+import asyncio
+from datetime import datetime, timezone
+from pymongo import UpdateOne
 from pymongo.errors import BulkWriteError
 from .connection import MongoConn
 from .validation_utils import ensure_connected
+from .query_utils import (
+    TAG_TIME_INDEX,
+    TAG_MODE_TIME_INDEX,
+    legacy_deck_cards_expr,
+    deck_key_expr,
+)
+
+logger = logging.getLogger(__name__)
+
+# Battles per insert_many call, the chunks of a large scrape are inserted concurrently
+INSERT_CHUNK_SIZE = 1000
+
+# Marker documents of the one-off maintenance steps, a step is skipped once its marker exists
+MIGRATIONS_COLLECTION = "migrations"
+PLAYER_SUMMARIES_MIGRATION = "player_summaries"
+REFERENCE_PLAYER_DECKS_MIGRATION = "reference_player_decks"
 
 
 async def insert_battles(conn: MongoConn, battle_logs):
@@ -22,17 +42,266 @@ async def insert_battles(conn: MongoConn, battle_logs):
         if not isinstance(battle_logs, list):
             raise ValueError("battle_logs must be a list of dictionaries.")
 
-        await conn.db.battles.insert_many(battle_logs, ordered=False)
-
-    except BulkWriteError as bwe:
-        # Check if it's a duplicate key error (E11000)
-        if any(err.get("code") == 11000 for err in bwe.details.get("writeErrors", [])):
-            print(
-                "[DB] [INFO] Duplicate — some battles were already in the collection."
-            )
-        else:
-            print(f"[DB] Bulk write error: {bwe.details}")
-            raise
+        # Widen the summaries first, if the insert fails they only cover too much,
+        # which never hides stored battles from the readers
+        await update_player_summaries(conn, battle_logs)
+
+        # Large scrapes are inserted in concurrent chunks instead of one huge batch
+        results = await asyncio.gather(
+            *(
+                conn.db.battles.insert_many(
+                    battle_logs[i : i + INSERT_CHUNK_SIZE], ordered=False
+                )
+                for i in range(0, len(battle_logs), INSERT_CHUNK_SIZE)
+            ),
+            return_exceptions=True,
+        )
+
+        duplicates = False
+        for result in results:
+            if isinstance(result, BulkWriteError):
+                # Duplicate key errors (E11000) are expected, the unique index on
+                # (referencePlayerTag, battleTime) rejects battles that were already stored
+                write_errors = result.details.get("writeErrors", [])
+                other_errors = [err for err in write_errors if err.get("code") != 11000]
+                if other_errors:
+                    logger.error("Bulk write error: %s", other_errors)
+                    raise result
+                duplicates = True
+            elif isinstance(result, BaseException):
+                raise result
+
+        if duplicates:
+            logger.info("Duplicate — some battles were already in the collection")
+
+    except Exception as e:
+        logger.error("during insertion: %s", e)
+        raise
+
+
+async def ensure_battle_indexes(conn: MongoConn):
+    """
+    Ensures the battle indexes exist, the unique one makes insert_battles idempotent.
+
+    Mirrors the indexes from the mongo init script, so a database created without them
+    still rejects duplicate battles on insert. The unique index bounds the
+    `referencePlayerTag` match and `battleTime` sort/range of the battle read queries,
+    the game mode index serves the ranges filtered by game modes. The read queries
+    hint both indexes, so they fail without them.
+    Each index is created on its own, a failing one doesn't keep the other from
+    being created. Creating an already existing index is a no-op.
+
+    Args:
+        conn (MongoConn): Active connection to the mongo database
+
+    Raises:
+        Exception: If the creation of any index fails
+    """
+
+    await ensure_connected(conn)
+    indexes = [
+        ([("referencePlayerTag", 1), ("battleTime", -1)], TAG_TIME_INDEX, True),
+        # Lets game mode filtered ranges skip battles of other modes within the index
+        (
+            [("referencePlayerTag", 1), ("gameMode", 1), ("battleTime", -1)],
+            TAG_MODE_TIME_INDEX,
+            False,
+        ),
+    ]
+
+    error = None
+    for keys, name, unique in indexes:
+        try:
+            await conn.db.battles.create_index(keys, unique=unique, name=name)
+        except Exception as e:
+            logger.error("creating battle index %s: %s", name, e)
+            error = error or e
+
+    if error is not None:
+        raise error
+
+
+async def update_player_summaries(conn: MongoConn, battle_logs):
+    """
+    Widens the battle time span stored per player in the player_summary collection.
+
+    The summaries let readers skip queries for time ranges without any battles.
+
+    Args:
+        conn (MongoConn): Active connection to the mongo database
+        battle_logs (list): Battle log dictionaries about to be inserted
+
+    Raises:
+        Exception: If the update fails
+    """
+
+    # Time span of the given battles per player
+    spans = {}
+    for battle in battle_logs:
+        tag = battle["referencePlayerTag"]
+        battle_time = battle["battleTime"]
+        first, last = spans.get(tag, (battle_time, battle_time))
+        spans[tag] = (min(first, battle_time), max(last, battle_time))
+
+    if not spans:
+        return
+
+    try:
+        await conn.db.player_summary.bulk_write(
+            [
+                UpdateOne(
+                    {"_id": tag},
+                    {"$min": {"firstBattle": first}, "$max": {"lastBattle": last}},
+                    upsert=True,
+                )
+                for tag, (first, last) in spans.items()
+            ],
+            ordered=False,
+        )
+    except Exception as e:
+        logger.error("updating player summaries: %s", e)
+        raise
+
+
+async def is_migration_done(conn: MongoConn, name: str) -> bool:
+    """
+    Checks if a one-off maintenance step already ran to completion.
+
+    Args:
+        conn (MongoConn): Active connection to the mongo database
+        name (str): Name of the maintenance step
+
+    Returns:
+        bool: True if the step's marker document exists
+    """
+
+    marker = await conn.db[MIGRATIONS_COLLECTION].find_one({"_id": name}, {"_id": 1})
+    return marker is not None
+
+
+async def mark_migration_done(conn: MongoConn, name: str):
+    """
+    Stores the marker document of a completed one-off maintenance step.
+
+    Args:
+        conn (MongoConn): Active connection to the mongo database
+        name (str): Name of the maintenance step
+    """
+
+    await conn.db[MIGRATIONS_COLLECTION].update_one(
+        {"_id": name},
+        {"$set": {"completedAt": datetime.now(timezone.utc)}},
+        upsert=True,
+    )
+
+
+async def ensure_player_summaries(conn: MongoConn):
+    """
+    Builds the player_summary collection from the stored battles, once.
+
+    A one-off maintenance step: the first run covers the battles stored before the
+    summaries existed, afterwards `insert_battles` keeps them up to date and later
+    runs return right away. Existing summaries are only widened, never narrowed.
+    After battles were written without `insert_battles` (e.g. restored or imported
+    ones), delete the `player_summaries` document of the `migrations` collection,
+    so the next start scans the battles again.
+
+    Args:
+        conn (MongoConn): Active connection to the mongo database
+
+    Raises:
+        Exception: If building the summaries fails
+    """
+
+    try:
+        await ensure_connected(conn)
+        if await is_migration_done(conn, PLAYER_SUMMARIES_MIGRATION):
+            return
+
+        pipeline = [
+            {
+                "$group": {
+                    "_id": "$referencePlayerTag",
+                    "firstBattle": {"$min": "$battleTime"},
+                    "lastBattle": {"$max": "$battleTime"},
+                }
+            },
+            {
+                "$merge": {
+                    "into": "player_summary",
+                    # Summaries written by insert_battles meanwhile are widened
+                    "whenMatched": [
+                        {
+                            "$set": {
+                                "firstBattle": {
+                                    "$min": ["$firstBattle", "$$new.firstBattle"]
+                                },
+                                "lastBattle": {
+                                    "$max": ["$lastBattle", "$$new.lastBattle"]
+                                },
+                            }
+                        }
+                    ],
+                    "whenNotMatched": "insert",
+                }
+            },
+        ]
+        await conn.db.battles.aggregate(pipeline, allowDiskUse=True).to_list(
+            length=None
+        )
+        await mark_migration_done(conn, PLAYER_SUMMARIES_MIGRATION)
+    except Exception as e:
+        logger.error("building player summaries: %s", e)
+        raise
+
+
+async def backfill_reference_player_decks(conn: MongoConn) -> int:
+    """
+    Stores the reference player's deck on battles inserted before the scraper did so.
+
+    Sets `referencePlayerCards` and `referencePlayerDeckKey` the same way the data
+    scraper does, so the statistics read the deck directly instead of searching
+    the `team` array on every aggregation. Battles that already have the deck are
+    left as they are.
+
+    A one-off maintenance step: no index serves the `$exists: false` match, so the
+    update scans every battle. Once it completed, later runs only look up its
+    marker document (`reference_player_decks` in the `migrations` collection).
+
+    Args:
+        conn (MongoConn): Active connection to the mongo database
+
+    Returns:
+        int: The amount of battles updated, 0 if the step ran before
+
+    Raises:
+        Exception: If the update fails
+    """
+
+    try:
+        await ensure_connected(conn)
+        if await is_migration_done(conn, REFERENCE_PLAYER_DECKS_MIGRATION):
+            return 0
+
+        res = await conn.db.battles.update_many(
+            {"referencePlayerCards": {"$exists": False}},
+            [
+                {
+                    "$set": {
+                        "referencePlayerCards": legacy_deck_cards_expr(
+                            "$referencePlayerTag"
+                        )
+                    }
+                },
+                {
+                    "$set": {
+                        "referencePlayerDeckKey": deck_key_expr("$referencePlayerCards")
+                    }
+                },
+            ],
+        )
+        await mark_migration_done(conn, REFERENCE_PLAYER_DECKS_MIGRATION)
+        return res.modified_count
     except Exception as e:
-        print(f"[DB] [ERROR] during insertion: {e}")
+        logger.error("backfilling reference player decks: %s", e)
         raise
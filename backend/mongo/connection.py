@@ -1,7 +1,18 @@
+import logging
 import os
 import asyncio
+import time
 from motor.motor_asyncio import AsyncIOMotorClient
 
+logger = logging.getLogger(__name__)
+
+# Connections per client, also the amount of aggregations that may run concurrently
+MAX_POOL_SIZE = 50
+# Milliseconds an operation waits for a free pooled connection before failing
+WAIT_QUEUE_TIMEOUT_MS = 2000
+# Seconds a successful ping vouches for the connection, before the next liveness check pings again
+LIVENESS_TTL = 30.0
+
 
 def build_uri_from_parts():
     user = os.getenv("MONGO_APP_USER")
@@ -30,40 +41,70 @@ class MongoConn:
         self.client: AsyncIOMotorClient | None = None
         self.db = None
         self.is_connected = False
+        # Monotonic time until which the connection counts as alive without a new ping
+        self._alive_until = 0.0
+        # Heavy aggregations wait here instead of piling up in the driver's wait queue
+        self.aggregation_slots = asyncio.Semaphore(MAX_POOL_SIZE)
 
     async def connect(self):
-        """Connect to the database and send a test ping"""
+        """
+        Connect to the database and send a test ping.
+
+        The client is created once and reused on reconnects, its pool and server
+        monitoring recover from outages on their own, so no second pool is opened.
+        """
         try:
-            self.client = AsyncIOMotorClient(self._uri, appname=self._app_name)
-            self.db = self.client[self._db_name]
+            if self.client is None:
+                self.client = AsyncIOMotorClient(
+                    self._uri,
+                    appname=self._app_name,
+                    # Battle documents are highly compressible; prefer zstd, fall back to snappy/zlib
+                    compressors="zstd,snappy,zlib",
+                    maxPoolSize=MAX_POOL_SIZE,
+                    minPoolSize=5,
+                    waitQueueTimeoutMS=WAIT_QUEUE_TIMEOUT_MS,
+                    # Failed reads/writes are retried once by the driver after a reconnect
+                    retryReads=True,
+                    retryWrites=True,
+                )
+                self.db = self.client[self._db_name]
             await self.client.admin.command("ping")
             self.is_connected = True
-            print("[DB] Connected to MongoDB successfully.")
+            self._alive_until = time.monotonic() + LIVENESS_TTL
+            logger.info("Connected to MongoDB successfully")
         except Exception as e:
             self.is_connected = False
-            print(f"[DB] Failed to connect to MongoDB: {e}")
+            self._alive_until = 0.0
+            logger.error("Failed to connect to MongoDB: %s", e)
             raise
 
     async def is_connection_alive(self):
-        """Ping the database to check if it is up and running"""
+        """Ping the database to check if it is up and running, at most every `LIVENESS_TTL` seconds"""
         if not self.client or not self.is_connected:
             return False
+        if time.monotonic() < self._alive_until:
+            return True
         try:
             await self.client.admin.command("ping")
+            self._alive_until = time.monotonic() + LIVENESS_TTL
             return True
         except Exception:
             self.is_connected = False
+            self._alive_until = 0.0
             return False
 
     async def ensure_connection(self):
         """Ensure connection is alive, reconnect if necessary"""
         if not await self.is_connection_alive():
-            print("[DB] Connection lost, attempting to reconnect...")
+            logger.warning("Connection lost, attempting to reconnect...")
             await self.connect()
 
     def close(self):
         """Close the database connection"""
         if self.client:
             self.client.close()
+            self.client = None
+            self.db = None
             self.is_connected = False
-            print("[DB] MongoDB connection closed.")
+            self._alive_until = 0.0
+            logger.info("MongoDB connection closed")
@@ -1,6 +1,9 @@
+import logging
 from .connection import MongoConn
 from .validation_utils import ensure_connected
 
+logger = logging.getLogger(__name__)
+
 
 async def get_game_modes(conn: MongoConn):
     """
@@ -31,5 +34,5 @@ async def get_game_modes(conn: MongoConn):
         return game_modes
 
     except Exception as e:
-        print("[DB] [ERROR] fetching game modes", e)
+        logger.error("fetching game modes: %s", e)
         raise
@@ -1,7 +1,11 @@
+import logging
 from datetime import datetime
+from pymongo import UpdateOne
 from .connection import MongoConn
 from .validation_utils import ensure_connected
 
+logger = logging.getLogger(__name__)
+
 
 async def insert_game_modes(conn: MongoConn, game_modes: list):
     """
@@ -21,11 +25,12 @@ async def insert_game_modes(conn: MongoConn, game_modes: list):
         await ensure_connected(conn)
         now = datetime.now()
 
-        inserted = 0
-        modified = 0
+        if not game_modes:
+            return {"inserted": 0, "modified": 0}
 
-        for name in game_modes:
-            res = await conn.db.game_modes.update_one(
+        # One round trip for all modes, the upserts are independent of each other
+        ops = [
+            UpdateOne(
                 {"name": name},
                 {
                     "$set": {"lastSeen": now},
@@ -33,17 +38,15 @@ async def insert_game_modes(conn: MongoConn, game_modes: list):
                 },
                 upsert=True,
             )
-
-            if res.upserted_id is not None:
-                inserted += 1
-            elif res.modified_count > 0:
-                modified += 1
+            for name in game_modes
+        ]
+        res = await conn.db.game_modes.bulk_write(ops, ordered=False)
 
         return {
-            "inserted": inserted,  # how many new docs created
-            "modified": modified,  # how many existing docs got lastSeen updated
+            "inserted": res.upserted_count,  # how many new docs created
+            "modified": res.modified_count,  # how many existing docs got lastSeen updated
         }
 
     except Exception as e:
-        print("[DB] [ERROR] inserting game modes", e)
+        logger.error("inserting game modes: %s", e)
         raise
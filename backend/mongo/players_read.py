@@ -1,6 +1,32 @@
+import logging
+from pymongo.errors import OperationFailure
 from .connection import MongoConn
 from .validation_utils import ensure_connected
 
+logger = logging.getLogger(__name__)
+
+# Player documents fetched per cursor batch, the projected documents are tiny
+PLAYERS_BATCH_SIZE = 5000
+# Partial index over the active players only, serving the tracked player tags lookup
+ACTIVE_PLAYER_TAGS_INDEX = "active_playerTag_index"
+# Server error code of a result document exceeding the 16 MB BSON limit
+BSON_OBJECT_TOO_LARGE = 10334
+
+# Builds the {tag: name} map of the active players server-side, as a single document
+TRACKED_PLAYERS_MAP_PIPELINE = [
+    {"$match": {"active": True}},
+    {"$sort": {"playerTag": 1}},
+    {
+        "$group": {
+            "_id": None,
+            "players": {
+                "$push": {"k": "$playerTag", "v": {"$ifNull": ["$playerName", None]}}
+            },
+        }
+    },
+    {"$replaceWith": {"$arrayToObject": "$players"}},
+]
+
 
 async def check_player_tracked(conn: MongoConn, player_tag: str):
     """
@@ -19,8 +45,12 @@ async def check_player_tracked(conn: MongoConn, player_tag: str):
     try:
         await ensure_connected(conn)
 
+        # Only index keys are projected, so the partial active players index covers the lookup,
+        # the hint skips the plan selection between it and the playerTag index
         doc = await conn.db.players.find_one(
-            {"playerTag": player_tag, "active": True}, {"_id": 1}
+            {"playerTag": player_tag, "active": True},
+            {"_id": 0, "playerTag": 1},
+            hint=ACTIVE_PLAYER_TAGS_INDEX,
         )
 
         if not doc:
@@ -28,7 +58,7 @@ async def check_player_tracked(conn: MongoConn, player_tag: str):
         return True
 
     except Exception as e:
-        print(f"[DB] [ERROR] trying to fetch the tracked players: {e}")
+        logger.error("trying to fetch the tracked players: %s", e)
         raise
 
 
@@ -49,24 +79,13 @@ async def get_tracked_player_tags(conn: MongoConn):
     try:
         await ensure_connected(conn)
 
-        cursor = conn.db.players.find(
-            # only active/tracked players
-            {"active": True},
-            # projection: only fetch player tags
-            {"_id": 0, "playerTag": 1},
-        ).sort(
-            "playerTag", 1
-        )  # sort ascending
-
-        # Turn the player tags into a set to avoid duplicates if those were
-        # to happen in the players collection
-        tags = set()
-        async for doc in cursor:
-            tags.add(doc["playerTag"])
-        return tags
+        # The distinct tags of the active/tracked players come back in a single reply,
+        # read from the keys of the partial active players index
+        tags = await conn.db.players.distinct("playerTag", {"active": True})
+        return set(tags)
 
     except Exception as e:
-        print(f"[DB] [ERROR] trying to fetch the tracked players tags: {e}")
+        logger.error("trying to fetch the tracked players tags: %s", e)
         raise
 
 
@@ -87,6 +106,17 @@ async def get_tracked_players(conn: MongoConn):
     try:
         await ensure_connected(conn)
 
+        # The map comes back as one document, instead of a document per player
+        try:
+            docs = await conn.db.players.aggregate(
+                TRACKED_PLAYERS_MAP_PIPELINE, hint=ACTIVE_PLAYER_TAGS_INDEX
+            ).to_list(length=1)
+            return docs[0] if docs else {}
+        except OperationFailure as e:
+            if e.code != BSON_OBJECT_TOO_LARGE:
+                raise
+
+        # Too many players for a single document, fetch them one by one instead
         cursor = conn.db.players.find(
             # only active/tracked players
             {"active": True},
@@ -96,14 +126,12 @@ async def get_tracked_players(conn: MongoConn):
             "playerTag", 1
         )  # sort ascending
 
-        # Return a dict
-        players = {}
-        async for doc in cursor:
-            players[doc["playerTag"]] = doc.get("playerName")
-        return players
+        # Fetch all batches first, then build the dict in a plain comprehension
+        docs = await cursor.batch_size(PLAYERS_BATCH_SIZE).to_list(length=None)
+        return {doc["playerTag"]: doc.get("playerName") for doc in docs}
 
     except Exception as e:
-        print(f"[DB] [ERROR] trying to fetch the tracked players: {e}")
+        logger.error("trying to fetch the tracked players: %s", e)
         raise
 
 
@@ -123,8 +151,8 @@ async def get_players_count(conn: MongoConn):
 
     try:
         await ensure_connected(conn)
-        count = await conn.db.players.count_documents({})
+        count = await conn.db.players.estimated_document_count()
         return count
     except Exception as e:
-        print(f"[DB] [ERROR] fetching document count: {e}")
+        logger.error("fetching document count: %s", e)
         raise
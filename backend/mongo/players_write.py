@@ -1,6 +1,83 @@
-from datetime import datetime
+import logging
+from datetime import datetime, timezone
+from pymongo import ReturnDocument
+from pymongo.write_concern import WriteConcern
 from .connection import MongoConn
 from .validation_utils import ensure_connected
+from .players_read import ACTIVE_PLAYER_TAGS_INDEX
+
+logger = logging.getLogger(__name__)
+
+# The player updates are acknowledged without waiting for the journal, they're idempotent
+# per tag and a lost one is just repeated by the user. Pinned explicitly, so a move to a
+# replica set (default w: "majority") doesn't slow down tracking
+PLAYERS_WRITE_CONCERN = WriteConcern(w=1, j=False)
+
+
+def players_collection(conn: MongoConn):
+    """
+    Returns the players collection with the write concern for player updates.
+
+    Args:
+        conn (MongoConn): Active MongoDB connection instance.
+
+    Returns:
+        AsyncIOMotorCollection: The players collection using `PLAYERS_WRITE_CONCERN`.
+    """
+
+    return conn.db.get_collection("players", write_concern=PLAYERS_WRITE_CONCERN)
+
+
+def tracked_player_update(player_tag: str, player_name: str, now: datetime) -> list:
+    """
+    Builds the update pipeline that creates, reactivates or keeps a tracked player.
+
+    - If the player doesn't exist: created with active=True, insertedAt and the name.
+    - If the player is inactive: set active=True again, with reactivatedAt.
+    - Otherwise only updatedAt changes.
+
+    Args:
+        player_tag (str): The unique tag of the player (e.g., "#YYRJQY28").
+        player_name (str): The name to set for a newly created player.
+        now (datetime): The UTC time of the update, stored as a BSON date.
+
+    Returns:
+        list: An update pipeline for an upserting update on `{"playerTag": player_tag}`
+    """
+
+    return [
+        {
+            "$set": {
+                "playerTag": player_tag,
+                "active": True,
+                "updatedAt": now,
+                "insertedAt": {"$ifNull": ["$insertedAt", now]},
+                "playerName": {"$ifNull": ["$playerName", player_name]},
+                # Evaluated against the stored document, before active is set
+                "reactivatedAt": {
+                    "$cond": [{"$eq": ["$active", False]}, now, "$reactivatedAt"]
+                },
+            }
+        }
+    ]
+
+
+def tracked_player_status(previous) -> str:
+    """
+    Classifies a tracked player update by the player document before it.
+
+    Args:
+        previous (dict | None): The player document before the update, None if it didn't exist.
+
+    Returns:
+        str: "created", "reactivated", or "already_tracked"
+    """
+
+    if previous is None:
+        return "created"
+    if previous.get("active") is False:
+        return "reactivated"
+    return "already_tracked"
 
 
 async def insert_tracked_player(
@@ -12,44 +89,32 @@ async def insert_tracked_player(
     - If the player doesn't exist: create with active=True.
     - If the player exists: set active=True again (reactivate).
 
+    The update returns the previous document, so a single round trip both
+    writes and tells which case applied.
+
     Args:
         conn (MongoConn): Active MongoDB connection instance.
         player_tag (str): The unique tag of the player (e.g., "#YYRJQY28").
         player_name (str): The name to set for the player (default: "Player").
 
     Returns:
-        str: "created", "reactivated", or "already_active"
+        str: "created", "reactivated", or "already_tracked"
     """
     try:
         await ensure_connected(conn)
-        now = datetime.now().strftime("%Y-%m-%d %H-%M-%S")
+        now = datetime.now(timezone.utc)
 
-        # Try to reactivate if it exists but is inactive
-        res = await conn.db.players.update_one(
-            {"playerTag": player_tag, "active": False},
-            {"$set": {"active": True, "reactivatedAt": now, "updatedAt": now}},
-            upsert=False,
-        )
-        if res.matched_count == 1:
-            return "reactivated"
-
-        # If not matched above, upsert (create if missing, otherwise just ensure active)
-        res = await conn.db.players.update_one(
+        previous = await players_collection(conn).find_one_and_update(
             {"playerTag": player_tag},
-            {
-                "$set": {"playerTag": player_tag, "active": True, "updatedAt": now},
-                "$setOnInsert": {"insertedAt": now, "playerName": player_name},
-            },
+            tracked_player_update(player_tag, player_name, now),
+            projection={"_id": 0, "active": 1},
             upsert=True,
+            return_document=ReturnDocument.BEFORE,
         )
-
-        if res.upserted_id is not None:
-            return "created"
-
-        return "already_tracked"
+        return tracked_player_status(previous)
 
     except Exception as e:
-        print(f"[DB] [ERROR] during insert/reactivate for player: {player_tag}", e)
+        logger.error("during insert/reactivate for player %s: %s", player_tag, e)
         raise
 
 
@@ -71,19 +136,20 @@ async def set_player_name(conn: MongoConn, player_tag: str, player_name: str):
         await ensure_connected(conn)
 
         # Set the name for the player with the specified tag
-        res = await conn.db.players.update_one(
+        res = await players_collection(conn).update_one(
             {"playerTag": player_tag},
             {"$set": {"playerName": player_name}},
             upsert=False,
         )
 
         if res.matched_count == 0:
-            print(
-                f"[DB] [WARNING] player {player_tag} was not found in collection and couldn't set player name."
+            logger.warning(
+                "player %s was not found in collection and couldn't set player name",
+                player_tag,
             )
 
     except Exception as e:
-        print(f"[DB] [ERROR] during name setting for player: {player_tag}", e)
+        logger.error("during name setting for player %s: %s", player_tag, e)
         raise
 
 
@@ -104,9 +170,9 @@ async def deactivate_tracked_player(conn: MongoConn, player_tag) -> int:
 
     try:
         await ensure_connected(conn)
-        current_time = datetime.now().strftime("%Y-%m-%d %H-%M-%S")
+        current_time = datetime.now(timezone.utc)
 
-        res = await conn.db.players.update_one(
+        res = await players_collection(conn).update_one(
             {"playerTag": player_tag, "active": True},
             {"$set": {"active": False, "deactivatedAt": current_time}},
         )
@@ -115,5 +181,33 @@ async def deactivate_tracked_player(conn: MongoConn, player_tag) -> int:
         return res.matched_count
 
     except Exception as e:
-        print(f"[DB] [ERROR] during update: {e}")
+        logger.error("during update: %s", e)
+        raise
+
+
+async def ensure_player_indexes(conn: MongoConn):
+    """
+    Ensures the partial index over the tags of the active players exists.
+
+    Mirrors the index from the mongo init script. It only holds the active players,
+    so the tracked player tags are read from the index without fetching documents.
+    The tracked player reads hint it, so they fail without it.
+    Creating an already existing index is a no-op.
+
+    Args:
+        conn (MongoConn): Active connection to the mongo database
+
+    Raises:
+        Exception: If the index creation fails
+    """
+
+    try:
+        await ensure_connected(conn)
+        await conn.db.players.create_index(
+            [("active", 1), ("playerTag", 1)],
+            name=ACTIVE_PLAYER_TAGS_INDEX,
+            partialFilterExpression={"active": True},
+        )
+    except Exception as e:
+        logger.error("creating player indexes: %s", e)
         raise
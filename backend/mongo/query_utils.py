@@ -1,6 +1,23 @@
 from datetime import datetime, date, time, timedelta, timezone as tz_utc
+from functools import lru_cache
 from typing import Optional, Iterable
-from zoneinfo import ZoneInfo
+from zoneinfo import ZoneInfo, available_timezones
+
+# Upper bound of unique decks/cards a stats aggregation returns, guards against pathological results
+STATS_RESULT_LIMIT = 10_000
+
+# Names of the battle indexes serving the player/time range matches
+TAG_TIME_INDEX = "referencePlayerTag_battleTime_index"
+TAG_MODE_TIME_INDEX = "referencePlayerTag_mode_time_index"
+
+# Valid IANA timezone names, listed once at import, so invalid names are rejected
+# with a set lookup instead of a filesystem probe per request
+KNOWN_TIMEZONES = frozenset(available_timezones())
+
+# 1 for a won battle, else 0. Stored as `isWin` by the scraper, derived for older documents
+WIN_FLAG = {
+    "$ifNull": ["$isWin", {"$cond": [{"$eq": ["$gameResult", "Victory"]}, 1, 0]}]
+}
 
 
 def match_tag_before_datetime_stage(player_tag: str, before_datetime: datetime):
@@ -33,6 +50,40 @@ def match_tag_before_datetime_stage(player_tag: str, before_datetime: datetime):
     }
 
 
+@lru_cache(maxsize=1024)
+def utc_day_window(start_date: date, end_date: date, timezone: str = "UTC"):
+    """
+    Converts a full-day date window in the given timezone into UTC datetimes.
+
+    The window spans from `start_date` at 00:00:00 (inclusive) to
+    `end_date + 1 day` at 00:00:00 (exclusive). The result only depends on the
+    arguments, so it's cached for the recurring (dates, timezone) combinations.
+
+    Args:
+        start_date (datetime.date): First day (inclusive).
+        end_date (datetime.date): Last day (inclusive).
+        timezone (str): Timezone the dates are given in (default: UTC)
+
+    Returns:
+        tuple[datetime, datetime]: The UTC start (inclusive) and end (exclusive).
+
+    Raises:
+        ValueError: If the timezone is invalid.
+    """
+
+    # Check if the given timezone exists and is valid
+    if timezone not in KNOWN_TIMEZONES:
+        raise ValueError(f"Invalid timezone: {timezone}")
+    tz = ZoneInfo(timezone)
+
+    # Turn start/end date into requested timezone dates
+    start_local = datetime.combine(start_date, time(0, 0), tzinfo=tz)
+    end_local = datetime.combine(end_date + timedelta(days=1), time(0, 0), tzinfo=tz)
+
+    # Convert to UTC for lookup in database
+    return start_local.astimezone(tz_utc.utc), end_local.astimezone(tz_utc.utc)
+
+
 def match_tag_date_mode_range_stage(
     player_tag: str,
     start_date: date,
@@ -67,22 +118,12 @@ def match_tag_date_mode_range_stage(
                 }
               }
 
-    Notes: This function is a pure builder and does not execute any database operation
+    Notes: This function is a pure builder and does not execute any database operation.
+           The stage has to be the first of the pipeline, so it's answered by the
+           (referencePlayerTag, battleTime) index.
     """
 
-    # Check if the given timezone exists and is valid
-    try:
-        tz = ZoneInfo(timezone)
-    except Exception as e:
-        raise ValueError(f"Invalid timezone: {timezone}") from e
-
-    # Turn start/end date into requested timezone dates
-    start_local = datetime.combine(start_date, time(0, 0), tzinfo=tz)
-    end_local = datetime.combine(end_date + timedelta(days=1), time(0, 0), tzinfo=tz)
-
-    # Convert to UTC for lookup in database
-    start_utc = start_local.astimezone(tz_utc.utc)
-    end_utc = end_local.astimezone(tz_utc.utc)
+    start_utc, end_utc = utc_day_window(start_date, end_date, timezone)
 
     match = {
         "referencePlayerTag": player_tag,
@@ -96,36 +137,75 @@ def match_tag_date_mode_range_stage(
     return {"$match": match}
 
 
-def extract_deck_cards_stage(player_tag: str):
+def range_index_hint(match_stage: dict) -> str:
     """
-    Build a MongoDB `$addFields` stage that extracts the given player's deck cards
-    into a normalized `deckCards` array.
+    Picks the battle index an aggregation starting with the given match stage is pinned to.
 
-    For the team member with `tag == player_tag`, this stage pulls their `cards`
-    array and maps each entry to the following schema:
-      - `id` (card id; may be absent in some logs)
-      - `name` (defaults to "UNKNOWN" if missing)
-      - `level` (defaults to 1 if missing)
-      - `evolutionLevel` (integer, defaults to 0 if missing, which is the default for non-evolution cards)
+    Args:
+        match_stage (dict): Stage built by `match_tag_date_mode_range_stage`.
 
-    Missing values are handled via `$ifNull`; `evolutionLevel` is cast to an int.
+    Returns:
+        str: The name of the (referencePlayerTag, gameMode, battleTime) index if the match
+             filters by game modes, else the one of the (referencePlayerTag, battleTime) index.
+    """
+
+    if "gameMode" in match_stage["$match"]:
+        return TAG_MODE_TIME_INDEX
+    return TAG_TIME_INDEX
+
+
+def deck_fields_stage():
+    """
+    Build the MongoDB `$project` stage that keeps only the battle fields the deck
+    and card statistics read.
+
+    Placed right after the `$match`, so the deck extraction and grouping stages
+    handle small documents instead of the full battles with both teams and opponents.
+
+    Returns:
+        dict: An aggregation stage keeping the stored deck, the team tags and cards
+              (for older documents without the stored deck), the win flag inputs,
+              `battleTime` and `gameMode`.
+
+    Notes: This function is a pure builder and does not execute any database operation
+    """
+
+    return {
+        "$project": {
+            "_id": 0,
+            "referencePlayerCards": 1,
+            "referencePlayerDeckKey": 1,
+            "team.tag": 1,
+            "team.cards": 1,
+            "isWin": 1,
+            "gameResult": 1,
+            "battleTime": 1,
+            "gameMode": 1,
+        }
+    }
+
+
+def legacy_deck_cards_expr(player_tag: str):
+    """
+    Build the aggregation expression that extracts a player's deck cards from the
+    `team` array of a battle, for older documents without `referencePlayerCards`.
+
+    The cards of the team member with `tag == player_tag` are sorted (evolution level
+    first, then id) and mapped to the schema stored by the scraper, see
+    `extract_deck_cards_stage`.
 
     Args:
-        player_tag (str): The player tag used to select the team member whose
-            cards should be extracted.
+        player_tag (str): The player tag, or a field path like "$referencePlayerTag".
 
     Returns:
-        dict: An aggregation pipeline stage:
-              `{ "$addFields": { "deckCards": <mapped array> } }`,
-              suitable for insertion into a larger pipeline.
+        dict: An aggregation expression evaluating to the sorted deck cards.
 
     Notes: This function is a pure builder and does not execute any database operation
     """
 
-    # Extract the cards from the decks for the given player including evolution data
     return {
-        "$addFields": {
-            "deckCards": {
+        "$sortArray": {
+            "input": {
                 "$map": {
                     "input": {
                         "$ifNull": [
@@ -151,13 +231,221 @@ def extract_deck_cards_stage(player_tag: str):
                     "as": "c",
                     "in": {
                         "id": "$$c.id",
-                        "name": {"$ifNull": ["$$c.name", "UNKNOWN"]},
                         "level": {"$ifNull": ["$$c.level", 1]},
                         "evolutionLevel": {
                             "$toInt": {"$ifNull": ["$$c.evolutionLevel", 0]}
                         },
                     },
                 }
-            }
+            },
+            # Same order as the decks stored by the scraper
+            "sortBy": {"evolutionLevel": -1, "id": 1},
+        }
+    }
+
+
+def extract_deck_cards_stage(player_tag: str):
+    """
+    Build a MongoDB `$addFields` stage that extracts the given player's deck cards
+    into a normalized `deckCards` array.
+
+    Battles stored by the scraper carry the normalized and sorted deck in
+    `referencePlayerCards`, which is used as is. Only for older documents without
+    that field, the stage falls back to the team member with `tag == player_tag`,
+    pulls their `cards` array, sorts it (evolution level first, then id) and maps
+    each entry to the following schema:
+      - `id` (card id; may be absent in some logs)
+      - `level` (defaults to 1 if missing)
+      - `evolutionLevel` (integer, defaults to 0 if missing, which is the default for non-evolution cards)
+
+    Missing values are handled via `$ifNull`; `evolutionLevel` is cast to an int.
+    Card names aren't used by the statistics, clients resolve them from the card id.
+
+    Args:
+        player_tag (str): The player tag used to select the team member whose
+            cards should be extracted.
+
+    Returns:
+        dict: An aggregation pipeline stage:
+              `{ "$addFields": { "deckCards": <mapped array> } }`,
+              suitable for insertion into a larger pipeline.
+
+    Notes: This function is a pure builder and does not execute any database operation
+    """
+
+    legacy_deck_cards = legacy_deck_cards_expr(player_tag)
+
+    # Prefer the deck precomputed at ingestion time
+    return {
+        "$addFields": {
+            "deckCards": {"$ifNull": ["$referencePlayerCards", legacy_deck_cards]}
+        }
+    }
+
+
+def deck_key_expr(deck_cards: str):
+    """
+    Build the aggregation expression that turns sorted deck cards into the deck key,
+    for older documents without `referencePlayerDeckKey`.
+
+    Args:
+        deck_cards (str): Field path of the sorted deck cards, e.g. "$deckCards".
+
+    Returns:
+        dict: An aggregation expression evaluating to the deck key, which ignores card levels.
+
+    Notes: This function is a pure builder and does not execute any database operation
+    """
+
+    # Same format as the key built by the data scraper: "<id>:<evolutionLevel>;" per card
+    return {
+        "$reduce": {
+            "input": deck_cards,
+            "initialValue": "",
+            "in": {
+                "$concat": [
+                    "$$value",
+                    {"$ifNull": [{"$toString": "$$this.id"}, ""]},
+                    ":",
+                    {"$toString": "$$this.evolutionLevel"},
+                    ";",
+                ]
+            },
+        }
+    }
+
+
+def deck_group_stage():
+    """
+    Build the MongoDB `$group` stage that groups the matched battles into unique decks.
+
+    Battles are grouped by the `referencePlayerDeckKey` stored at ingestion time,
+    which ignores card levels. For older documents without that field the same key
+    is built from `deckCards`. Only one sample of the deck cards per group is kept,
+    its cards are already sorted (evolution level first, then id).
+
+    Returns:
+        dict: An aggregation stage producing documents of the form
+              `{_id, deckCards, count, wins, firstSeen, lastSeen, modes}`.
+              Expects the `deckCards` field, see `extract_deck_cards_stage`.
+
+    Notes: This function is a pure builder and does not execute any database operation
+    """
+
+    legacy_deck_key = deck_key_expr("$deckCards")
+
+    # Group by decks and get metadata
+    return {
+        "$group": {
+            "_id": {"$ifNull": ["$referencePlayerDeckKey", legacy_deck_key]},
+            "deckCards": {"$first": "$deckCards"},
+            "count": {"$sum": 1},
+            "wins": {"$sum": WIN_FLAG},
+            "firstSeen": {"$min": "$battleTime"},
+            "lastSeen": {"$max": "$battleTime"},
+            "modes": {"$addToSet": "$gameMode"},
         }
     }
+
+
+def deck_stats_stages():
+    """
+    Build the MongoDB aggregation stages that turn the grouped decks into the
+    deck statistics with their usage and win-rate.
+
+    The sample deck of each group is returned without the card levels.
+
+    Returns:
+        list: Aggregation stages producing documents of the form
+              `{deck, count, wins, winRate, firstSeen, lastSeen, modes}`,
+              sorted by count (descending) and lastSeen, at most `STATS_RESULT_LIMIT`.
+              Expects the grouped decks, see `deck_group_stage`.
+
+    Notes: This function is a pure builder and does not execute any database operation
+    """
+
+    return [
+        # Calculate a win rate and evolution metrics for the end result,
+        # only the new fields are set, the group's fields are kept as they are
+        {
+            "$set": {
+                # Sample deck without levels, already sorted by evolution level first, then id
+                "deck": {
+                    "$map": {
+                        "input": "$deckCards",
+                        "as": "card",
+                        "in": {
+                            "id": "$$card.id",
+                            "evolutionLevel": "$$card.evolutionLevel",
+                        },
+                    }
+                },
+                "winRate": {
+                    "$cond": [
+                        {"$eq": ["$count", 0]},
+                        0,
+                        {"$multiply": [{"$divide": ["$wins", "$count"]}, 100]},
+                    ]
+                },
+            }
+        },
+        {"$unset": ["_id", "deckCards"]},
+        # Sort unique decks by count (descending) and lastSeen
+        {"$sort": {"count": -1, "lastSeen": -1}},
+        {"$limit": STATS_RESULT_LIMIT},
+    ]
+
+
+def card_stats_stages():
+    """
+    Build the MongoDB aggregation stages that turn the grouped decks into the
+    statistics per card (id, evolution level) with their usage and win-rate.
+
+    A card is used once per battle of every deck containing it, so the usages and
+    wins of the decks are summed per card. Unwinding the unique decks instead of
+    every battle keeps the intermediate documents few.
+
+    Returns:
+        list: Aggregation stages producing documents of the form
+              `{card, usage, wins, winRate}`, sorted by usage (descending),
+              at most `STATS_RESULT_LIMIT`.
+              Expects the grouped decks, see `deck_group_stage`.
+
+    Notes: This function is a pure builder and does not execute any database operation
+    """
+
+    return [
+        {"$unwind": "$deckCards"},
+        {
+            "$group": {
+                "_id": {
+                    "id": "$deckCards.id",
+                    "evolutionLevel": "$deckCards.evolutionLevel",
+                },
+                "usage": {"$sum": "$count"},  # Usage in battle
+                "wins": {"$sum": "$wins"},
+            }
+        },
+        {
+            "$set": {
+                "card": "$_id",
+                "winRate": {
+                    "$cond": [
+                        {"$eq": ["$usage", 0]},
+                        0,
+                        {"$multiply": [{"$divide": ["$wins", "$usage"]}, 100]},
+                    ]
+                },
+            }
+        },
+        {"$unset": "_id"},
+        {"$sort": {"usage": -1}},
+        {"$limit": STATS_RESULT_LIMIT},
+    ]
+
+
+# The stats stages don't depend on the request, so they're built once at import
+DECK_FIELDS_STAGE = deck_fields_stage()
+DECK_GROUP_STAGE = deck_group_stage()
+DECK_STATS_STAGES = deck_stats_stages()
+CARD_STATS_STAGES = card_stats_stages()
@@ -1,6 +1,9 @@
+import logging
 from .connection import MongoConn
 from datetime import date
 
+logger = logging.getLogger(__name__)
+
 
 async def ensure_connected(conn: MongoConn):
     """
@@ -13,7 +16,7 @@ async def ensure_connected(conn: MongoConn):
         Exception: If re-connection failed
     """
     if not await conn.is_connection_alive():
-        print("[DB] Connection lost, attempting to reconnect...")
+        logger.warning("Connection lost, attempting to reconnect...")
         await conn.connect()
 
 
@@ -22,7 +25,8 @@ def check_valid_date_range(start_date, end_date):
     Checks if the given dates are valid and build a valid time range
 
     Args:
-        conn (MongoConn): Active connection to the mongo database
+        start_date (date): First day of the range.
+        end_date (date): Last day of the range.
 
     Raises:
         TypeError: If input isn't proper datetime.date
@@ -1,4 +1,29 @@
 from .redis_connection import RedisConn
 from .redis_connection import get_redis_json, set_redis_json, build_redis_key
+from .redis_connection import set_redis_json_many
+from .redis_connection import (
+    get_redis_raw,
+    get_redis_set,
+    is_redis_set_member,
+    get_redis_generation,
+    set_redis_set,
+    invalidate_redis_set,
+    TRACKED_PLAYER_TAGS_KEY,
+    TRACKED_PLAYER_TAGS_GENERATION_KEY,
+)
 
-__all__ = ["RedisConn", "get_redis_json", "set_redis_json", "build_redis_key"]
+__all__ = [
+    "RedisConn",
+    "get_redis_json",
+    "set_redis_json",
+    "set_redis_json_many",
+    "build_redis_key",
+    "get_redis_raw",
+    "get_redis_set",
+    "is_redis_set_member",
+    "get_redis_generation",
+    "set_redis_set",
+    "invalidate_redis_set",
+    "TRACKED_PLAYER_TAGS_KEY",
+    "TRACKED_PLAYER_TAGS_GENERATION_KEY",
+]
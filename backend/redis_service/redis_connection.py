@@ -1,9 +1,41 @@
 import redis.asyncio as redis
+from redis.exceptions import WatchError
 import hashlib
-import json
-from urllib.parse import quote
+import orjson
 from datetime import date, datetime, time
 import random
+from urllib.parse import quote
+from functools import lru_cache
+from operator import itemgetter
+from time import monotonic
+
+# Unversioned key (like 'global:version'), as the tracked players aren't bound to a scraping
+# cycle and are invalidated explicitly whenever a player is (un)tracked
+TRACKED_PLAYER_TAGS_KEY = "tracked:playerTags"
+
+# Counter bumped together with every invalidation of the tracked player tags, a repopulation
+# only writes the set if the counter didn't change since it started reading from Mongo
+TRACKED_PLAYER_TAGS_GENERATION_KEY = "tracked:playerTags:generation"
+
+# Sort key of the (name, value) param pairs, names are unique so the values are never compared
+_PARAM_NAME = itemgetter(0)
+
+# Bound once, jitter_ttl runs on every cache write
+_random = random.random
+
+# Seconds a fetched global version is reused before it's read from Redis again,
+# a version bump by another process is picked up after at most this long
+VERSION_CACHE_TTL = 1.0
+
+# Characters kept as they are in param names and values, the same ones as urllib.parse.quote
+_KEY_SAFE_CHARS = frozenset(
+    "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789_.-~"
+)
+# Percent-encodes every other ASCII character (delimiters like ':' and ',', '%' itself and
+# control characters), str.translate runs in C unlike urllib.parse.quote
+_KEY_ESCAPES = str.maketrans(
+    {chr(i): f"%{i:02X}" for i in range(128) if chr(i) not in _KEY_SAFE_CHARS}
+)
 
 
 class RedisConn:
@@ -25,6 +57,9 @@ class RedisConn:
         self._password = password
         self._decode = decode_responses
         self.client: redis.Redis
+        # Last known global version and the monotonic time until which it's reused
+        self._version: int | None = None
+        self._version_until = 0.0
 
     async def connect(self):
         """
@@ -49,10 +84,31 @@ class RedisConn:
     async def get_version(self) -> int:
         """
         Fetches the current global key version from Redis.
+
+        The version is reused for `VERSION_CACHE_TTL` seconds, so building a cache key
+        doesn't cost an extra round-trip on every lookup.
         """
 
+        if self._version is not None and monotonic() < self._version_until:
+            return self._version
+
         val = await self.client.get("global:version")
-        return int(val) if val is not None else 1
+        return self._remember_version(int(val) if val is not None else 1)
+
+    def _remember_version(self, version: int) -> int:
+        """
+        Stores the given version as the last known one for `get_version`.
+
+        Args:
+            version (int): The current global version.
+
+        Returns:
+            int: The given version.
+        """
+
+        self._version = version
+        self._version_until = monotonic() + VERSION_CACHE_TTL
+        return version
 
     async def increment_version(self) -> int:
         """
@@ -61,7 +117,29 @@ class RedisConn:
         """
 
         new_val = await self.client.incr("global:version")
-        return new_val
+        return self._remember_version(new_val)
+
+    async def set_json_and_increment_version(self, key: str, value, ttl: int) -> int:
+        """
+        Store a JSON value and increment the global version in one MULTI/EXEC round-trip.
+
+        Used to write a 'version-ahead' key and validate it with the same transaction.
+
+        Args:
+            key (str): Redis key to set.
+            value: Python object to serialize and store.
+            ttl (int): Time-to-live in seconds (key expires automatically).
+
+        Returns:
+            int: The new version number.
+        """
+
+        payload = _dump_json(value)
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.setex(key, jitter_ttl(ttl), payload)
+            pipe.incr("global:version")
+            _, new_val = await pipe.execute()
+        return self._remember_version(new_val)
 
     async def close(self):
         """
@@ -85,29 +163,146 @@ async def get_redis_json(conn: RedisConn, key: str):
     """
 
     raw_data = await conn.client.get(key)
-    return json.loads(raw_data) if raw_data else None
+    return orjson.loads(raw_data) if raw_data else None
 
 
-def _json_default(object):
+async def get_redis_raw(conn: RedisConn, key: str) -> str | None:
     """
-    JSON serializer function for objects not serializable by default.
+    Fetch a JSON value from Redis without deserializing it.
 
-    Handles datetime, date, and time objects by converting them to ISO format strings.
-    Used as the 'default' parameter in json.dumps() to handle these common types.
+    Lets callers that only pass the cached value on, e.g. as an HTTP response,
+    skip parsing it and serializing it again.
 
     Args:
-        object: The object that couldn't be serialized by the default JSON encoder.
+        conn (RedisConn): Wrapper around an async Redis connection.
+        key (str): Redis key to fetch.
 
     Returns:
-        str: ISO format string representation of datetime/date/time objects.
+        str | None: The stored JSON document if found, otherwise None.
+    """
+
+    raw_data = await conn.client.get(key)
+    return raw_data or None
 
-    Raises:
-        TypeError: If the object type is not supported for serialization.
+
+async def get_redis_set(conn: RedisConn, key: str) -> set[str] | None:
     """
+    Fetch all members of a Redis set.
 
-    if isinstance(object, (datetime, date, time)):
-        return object.isoformat()  # format datetimes as string for storage
-    raise TypeError(f"Object of type {type(object)} is not JSON serializable")
+    Args:
+        conn (RedisConn): Wrapper around an async Redis connection.
+        key (str): Redis key of the set.
+
+    Returns:
+        set[str] | None: The members if the set exists, otherwise None.
+    """
+
+    members = await conn.client.smembers(key)
+    return set(members) if members else None
+
+
+async def is_redis_set_member(conn: RedisConn, key: str, member: str) -> bool | None:
+    """
+    Check if a value is a member of a Redis set, in one round-trip.
+
+    Args:
+        conn (RedisConn): Wrapper around an async Redis connection.
+        key (str): Redis key of the set.
+        member (str): Value to look up.
+
+    Returns:
+        bool | None: Whether the value is a member, None if the set doesn't exist.
+    """
+
+    async with conn.client.pipeline(transaction=False) as pipe:
+        pipe.exists(key)
+        pipe.sismember(key, member)
+        exists, is_member = await pipe.execute()
+
+    if not exists:
+        return None
+    return bool(is_member)
+
+
+async def get_redis_generation(conn: RedisConn, generation_key: str) -> int:
+    """
+    Fetch the value of a generation counter, 0 if it was never bumped.
+
+    Args:
+        conn (RedisConn): Wrapper around an async Redis connection.
+        generation_key (str): Redis key of the counter.
+
+    Returns:
+        int: The current generation.
+    """
+
+    generation = await conn.client.get(generation_key)
+    return int(generation) if generation else 0
+
+
+async def set_redis_set(
+    conn: RedisConn,
+    key: str,
+    members,
+    ttl: int,
+    generation_key: str | None = None,
+    generation: int | None = None,
+) -> bool:
+    """
+    Replace a Redis set with the given members and a TTL in one MULTI/EXEC round-trip.
+
+    An empty iterable just removes the key, as Redis can't store empty sets.
+    With a generation key the set is only written if the counter still holds the given
+    generation (WATCH + MULTI), so members read before a concurrent invalidation
+    don't overwrite it.
+
+    Args:
+        conn (RedisConn): Wrapper around an async Redis connection.
+        key (str): Redis key of the set.
+        members (Iterable[str]): Members to store.
+        ttl (int): Time-to-live in seconds (key expires automatically).
+        generation_key (str | None): Redis key of the counter guarding the set.
+        generation (int | None): Generation read before the members were loaded.
+
+    Returns:
+        bool: Whether the set was written, False if the generation changed.
+    """
+
+    members = list(members)
+    async with conn.client.pipeline(transaction=True) as pipe:
+        if generation_key is not None:
+            await pipe.watch(generation_key)
+            current = await pipe.get(generation_key)
+            if (int(current) if current else 0) != generation:
+                return False
+            pipe.multi()
+
+        pipe.delete(key)
+        if members:
+            pipe.sadd(key, *members)
+            pipe.expire(key, jitter_ttl(ttl))
+        try:
+            await pipe.execute()
+        except WatchError:
+            return False
+    return True
+
+
+async def invalidate_redis_set(conn: RedisConn, key: str, generation_key: str):
+    """
+    Delete a Redis set and bump its generation counter in one MULTI/EXEC round-trip,
+    so a repopulation that already started doesn't write the outdated members.
+
+    Args:
+        conn (RedisConn): Wrapper around an async Redis connection.
+        key (str): Redis key of the set.
+        generation_key (str): Redis key of the counter guarding the set.
+    """
+
+    async with conn.client.pipeline(transaction=True) as pipe:
+        pipe.delete(key)
+        pipe.incr(generation_key)
+        await pipe.execute()
 
 
 async def set_redis_json(conn: RedisConn, key: str, value, ttl: int):
@@ -119,11 +314,57 @@ async def set_redis_json(conn: RedisConn, key: str, value, ttl: int):
         key (str): Redis key to set.
         value: Python object to serialize and store.
         ttl (int): Time-to-live in seconds (key expires automatically).
+
+    Returns:
+        bytes: The stored JSON document, so it can be reused without serializing again.
     """
 
     jittered_ttl = jitter_ttl(ttl)
-    payload = json.dumps(value, default=_json_default, separators=(",", ":"))
+    payload = _dump_json(value)
     await conn.client.setex(key, jittered_ttl, payload)
+    return payload
+
+
+async def set_redis_json_many(conn: RedisConn, items) -> list[bytes]:
+    """
+    Serialize several Python objects to JSON and store them in Redis with TTLs,
+    pipelined into a single round-trip.
+
+    Args:
+        conn (RedisConn): Wrapper around an async Redis connection.
+        items (Iterable[tuple[str, Any, int]]): The key, value and time-to-live in
+            seconds of every entry.
+
+    Returns:
+        list[bytes]: The stored JSON documents, in the order of the items.
+    """
+
+    payloads = []
+    async with conn.client.pipeline(transaction=False) as pipe:
+        for key, value, ttl in items:
+            payload = _dump_json(value)
+            pipe.setex(key, jitter_ttl(ttl), payload)
+            payloads.append(payload)
+        await pipe.execute()
+    return payloads
+
+
+def _dump_json(value) -> bytes:
+    """
+    Serialize a Python object to compact JSON bytes for storage in Redis.
+
+    Non-string dict keys are stringified, like the stdlib json module does.
+    datetime, date and time objects are written as ISO format strings natively by orjson,
+    without a Python callback per value.
+
+    Args:
+        value: Python object to serialize.
+
+    Returns:
+        bytes: Compact JSON representation of the value.
+    """
+
+    return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
 
 
 def jitter_ttl(ttl: int, pct: float = 0.10, min_ttl: int = 60) -> int:
@@ -143,9 +384,9 @@ def jitter_ttl(ttl: int, pct: float = 0.10, min_ttl: int = 60) -> int:
     if ttl <= 0:
         raise ValueError(f"ttl must be > 0 (got {ttl})")
 
-    random_factor = random.uniform(1 - pct, 1 + pct)  # e.g., 0.9 .. 1.1 for ±10%
-    jittered = int(round(ttl * random_factor))  # round the product to an int
-    return max(min_ttl, jittered)
+    # Offset in [-pct, +pct) of the ttl, e.g. ±10%
+    jittered = int(ttl + ttl * pct * (2 * _random() - 1) + 0.5)  # round to an int
+    return jittered if jittered > min_ttl else min_ttl
 
 
 def _to_param_str(val) -> str:
@@ -154,7 +395,6 @@ def _to_param_str(val) -> str:
 
     Handles different data types by converting them to consistent string formats:
     - datetime/date/time objects: ISO format strings
-    - lists/tuples: comma-separated values
     - booleans: 'true' or 'false' strings
     - other types: string conversion
 
@@ -165,22 +405,111 @@ def _to_param_str(val) -> str:
         str: String representation of the parameter value.
     """
 
+    # Plain strings and ints are the common case, checked by exact type first
+    val_type = type(val)
+    if val_type is str:
+        return val
+    if val_type is int:
+        return str(val)
+
     # Convert param data to a string
     if isinstance(val, (datetime, date, time)):
         return val.isoformat()
-    if isinstance(val, (list, tuple)):
-        return ",".join(_to_param_str(x) for x in val)
+    # bool before any int handling, as bool is a subclass of int
     if isinstance(val, bool):
         return "true" if val else "false"
     return str(val)
 
 
+def _escape_key_part(text: str) -> str:
+    """
+    Percent-encode a param name or value for Redis key building.
+
+    Every character outside `_KEY_SAFE_CHARS` is encoded, so the delimiters of the key
+    can't show up in a param. ASCII text is translated in one go, anything else falls
+    back to urllib.parse.quote, which encodes the same characters.
+
+    Args:
+        text (str): The param name or value.
+
+    Returns:
+        str: The encoded text.
+    """
+
+    if text.isascii():
+        return text.translate(_KEY_ESCAPES)
+    return quote(text, safe="")
+
+
+def _freeze_param_value(val) -> tuple:
+    """
+    Turn a param value into a hashable form that also holds its type.
+
+    The cache of `_params_segment` compares its arguments by equality, where
+    `True == 1 == 1.0`, the types keep such values from sharing a cached segment.
+
+    Args:
+        val: The parameter value.
+
+    Returns:
+        tuple: `(type, value)`, lists/tuples hold their frozen elements as value.
+    """
+
+    if isinstance(val, (list, tuple)):
+        return (type(val), tuple(_freeze_param_value(x) for x in val))
+    return (type(val), val)
+
+
+def _encode_param_value(frozen: tuple) -> str:
+    """
+    Convert a frozen param value to its encoded string representation for Redis key building.
+
+    Lists/tuples become comma-separated values, each element is encoded on its own,
+    so a ',' within an element can't be confused with the separator.
+    A leading '#' (player tags) is removed from every value.
+
+    Args:
+        frozen (tuple): The parameter value, see `_freeze_param_value`.
+
+    Returns:
+        str: Encoded string representation of the parameter value.
+    """
+
+    val_type, val = frozen
+    if issubclass(val_type, (list, tuple)):
+        return ",".join(_encode_param_value(x) for x in val)
+    return _escape_key_part(_to_param_str(val).lstrip("#"))
+
+
+@lru_cache(maxsize=4096)
+def _params_segment(items: tuple) -> str:
+    """
+    Build the 'param1=val1:param2=val2' part of a Redis key.
+
+    The same params are turned into a key several times per request (cache lookup,
+    computation, cache write), so the segments are cached.
+
+    Args:
+        items (tuple): The (name, frozen value) pairs of the params, see `_freeze_param_value`.
+
+    Returns:
+        str: The encoded params, sorted by name.
+    """
+
+    # Sort params to keep key deterministic even if order changes
+    return ":".join(
+        _escape_key_part(str(key)) + "=" + _encode_param_value(val)
+        for key, val in sorted(items, key=_PARAM_NAME)
+    )
+
+
 async def build_redis_key(
     conn: RedisConn,
     service: str,
     resource: str,
     params: dict | None = None,
     version_ahead: bool = False,
+    versioned: bool = True,
 ) -> str:
     """
     Build a consistent Redis key string.
@@ -193,36 +522,41 @@ async def build_redis_key(
                 These will be sorted and appended as 'key=value' segments.
                 e.g. {"player_tag": "YYRJQY28", "start_date": "2025-08-01", "end_date": 2025-08-01})
         version_ahead (bool): Flag deciding if the key is being built for the current version or the next one (default: False)
+        versioned (bool): If False, the key is prefixed with 'static' instead of the version,
+                so it outlives the invalidation of every scraping cycle.
+                Only for data that can't change anymore (default: True)
     Returns:
         str: A Redis key in the format 'version:service:resource:param1=val1:param2=val2'.
     """
 
-    # Build a key for one version ahead of the current one
-    version = await conn.get_version()
-    if version_ahead:
-        version += 1  # One version ahead
+    if versioned:
+        # Build a key for one version ahead of the current one
+        version = await conn.get_version()
+        if version_ahead:
+            version += 1  # One version ahead
 
-    version_str = f"v{version}"
+        version_str = f"v{version}"
+    else:
+        version_str = "static"
 
-    # Sort params to keep key deterministic even if order changes
     parts = [version_str, service, resource]
 
     if params:  # Only append params to key if they exist
-        for key, val in sorted(params.items()):
-            # Use quote to get rid of and encode delimiters like '_', ":", ...
-            val_stripped = str(val).lstrip(
-                "#"
-            )  # Remove leading '#', if player tag is in params
-            key_str = quote(str(key), safe="")
-            val_str = quote(_to_param_str(val_stripped), safe="")
-            parts.append(f"{key_str}={val_str}")
+        # Lists (e.g. game modes) are frozen, so the params can be looked up in the cache
+        items = tuple((key, _freeze_param_value(val)) for key, val in params.items())
+        try:
+            parts.append(_params_segment(items))
+        except TypeError:  # Unhashable param value, build the segment uncached
+            parts.append(_params_segment.__wrapped__(items))
 
     key = ":".join(parts)  # Build key string
-    # Check if the key is not too long (bytes)
-    if len(key.encode("utf-8")) < 512:
+    # Check if the key is not too long (bytes), ASCII keys have a byte per character
+    if key.isascii() and len(key) < 512:
+        return key
+    key_bytes = key.encode("utf-8")
+    if len(key_bytes) < 512:
         return key
 
-    # Uniquely hash key if it is too long
-    return (
-        version_str + ":" + service + ":" + hashlib.md5(key.encode("utf-8")).hexdigest()
-    )
+    # Uniquely hash key if it is too long, BLAKE2b is the fastest hash in hashlib on 64-bit
+    digest = hashlib.blake2b(key_bytes, digest_size=16).hexdigest()
+    return version_str + ":" + service + ":" + digest
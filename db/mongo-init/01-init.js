@@ -13,6 +13,11 @@ db.createUser({
 
 print(`[init] creating index on 'player' collection for unique 'playerTag'`);
 db.players.createIndex({ playerTag: 1 }, { unique: true, name: "tag_unique" });
+// Partial index over the active players, covers the tracked player tags lookup
+db.players.createIndex(
+  { active: 1, playerTag: 1 },
+  { name: "active_playerTag_index", partialFilterExpression: { active: true } }
+);
 
 print(`[init] creating index on 'game_modes' collection for unique 'name'`);
 db.game_modes.createIndex({ name: 1 }, { unique: true, name: "name_unique" });
@@ -33,3 +38,9 @@ db.battles.createIndex(
   { referencePlayerTag: 1, gameResult: 1, battleTime: -1 },
   { name: "referencePlayerTag_result_time_index" }
 );
+
+// Compound index for player statistics filtered by game modes
+db.battles.createIndex(
+  { referencePlayerTag: 1, gameMode: 1, battleTime: -1 },
+  { name: "referencePlayerTag_mode_time_index" }
+);
@@ -17,7 +17,7 @@ export type CardsResponse = {
 };
 
 export type Card = {
-  name: string;
+  name?: string; // Not sent with battle decks, resolved via the id and the card metadata
   id: number;
   level?: number;
   evolutionLevel?: number;
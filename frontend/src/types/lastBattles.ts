@@ -4,10 +4,7 @@ export type Player = {
   tag: string;
   name: string;
   crowns: number;
-  kingTowerHitPoints: number;
-  princessTowersHitPoints: number[];
   cards: Card[];
-  supportCards?: Card[];
   elixirLeaked: number;
 };
 